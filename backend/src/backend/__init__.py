@@ -6,8 +6,15 @@ from backend.router.certificate import router as certificate_router
 from backend.router.upload import router as upload_router
 from backend.router.utils import router as utils_router
 from backend.router.ai import router as ai_router
-from backend.database import init_db
+from backend.config import CONFIG
+from backend.database import async_session, init_db
+from backend.grouping import grouping_pool
+from backend.model.quiz_stats import quiz_stats
+from backend.router.quiz import refresh_match_index
+from backend.model.wordcloud import wordcloud_broadcaster, wordcloud_storage
+from backend.question_bank import question_banks
 from contextlib import asynccontextmanager
+import asyncio
 from fastapi.staticfiles import StaticFiles
 
 
@@ -15,12 +22,33 @@ from fastapi.staticfiles import StaticFiles
 async def lifepan(app: FastAPI):
     # Initialize database or other startup tasks
     await init_db()
+    # 首次部署时从已有答题记录构建统计
+    async with async_session() as db:
+        await quiz_stats.ensure_built(db)
+    # 预先加载"寻找最佳室友"的特质索引
+    async with async_session() as db:
+        await refresh_match_index(db)
+    # 词频表为空时导入旧版本 JSON 文件中的词频
+    async with async_session() as db:
+        await wordcloud_storage.import_legacy_data(db)
+    # 分寝求解共用的进程池
+    grouping_pool.start(CONFIG.QUIZ_GROUPING_WORKERS)
+    # 词频变化推送
+    wordcloud_broadcast_task = asyncio.create_task(wordcloud_broadcaster.run())
+    # 题库文件变化时自动重载
+    question_bank_watch_task = None
+    if CONFIG.QUIZ_BANK_WATCH_INTERVAL > 0:
+        question_bank_watch_task = asyncio.create_task(
+            question_banks.watch(CONFIG.QUIZ_BANK_WATCH_INTERVAL)
+        )
     try:
         # yield control back to FastAPI so the app runs
         yield
     finally:
-        # Optional cleanup/shutdown logic can go here, e.g. closing DB connections
-        pass
+        wordcloud_broadcast_task.cancel()
+        grouping_pool.shutdown()
+        if question_bank_watch_task is not None:
+            question_bank_watch_task.cancel()
 
 
 def create_app() -> FastAPI:
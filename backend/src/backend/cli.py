@@ -0,0 +1,151 @@
+"""命令行工具
+
+python -m backend.cli group-rooms codes.txt --room-size 4 --time-budget 3
+python -m backend.cli rescore --workers 8
+python -m backend.cli rebuild-stats
+python -m backend.cli check-bank new_bank.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+from fastapi import HTTPException
+
+from .config import CONFIG
+from .database import async_session, init_db
+from .model.quiz_stats import quiz_stats
+from .question_bank import QuestionBank
+from .rescoring import rescore_quiz_results
+from .router.quiz import dorm_grouping_payload, fetch_quiz_results
+
+
+async def group_rooms(args) -> dict:
+    """从数据库读取代码对应的答题结果并求解分寝"""
+    codes = list(dict.fromkeys(line.strip() for line in args.codes if line.strip()))
+    await init_db()
+    async with async_session() as db:
+        try:
+            profiles = await fetch_quiz_results(db, codes)
+        except HTTPException as exc:
+            raise SystemExit(exc.detail)
+    return dorm_grouping_payload(
+        profiles, args.room_size, args.time_budget, args.restarts, args.workers
+    )
+
+
+def print_rescore_progress(done: int, total: int, seconds: float):
+    rate = done / seconds if seconds > 0 else 0.0
+    sys.stderr.write(f"\r已重新计分 {done}/{total} 行，{rate:.0f} 行/秒")
+    if done >= total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+async def rescore(args) -> dict:
+    """按题库文件重新计算已保存答题结果的特质分数、主要特质和雷达图"""
+    await init_db()
+    try:
+        report = await rescore_quiz_results(
+            args.bank, args.chunk_size, args.workers, args.all, print_rescore_progress
+        )
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    return {
+        "rows": report.rows,
+        "seconds": round(report.seconds, 3),
+        "rows_per_second": round(report.rows_per_second, 1),
+        "bank_version": report.bank_version,
+        "scoring_version": report.scoring_version,
+    }
+
+
+async def rebuild_stats(args) -> dict:
+    """从答题记录完整重新计算 /quiz/stats 的累计统计"""
+    await init_db()
+    async with async_session() as db:
+        await quiz_stats.rebuild(db)
+        await db.commit()
+        return await quiz_stats.snapshot(db) or {}
+
+
+async def check_bank(args) -> dict:
+    """校验题库文件（连同团队称号表）能否加载，不修改任何数据
+
+    运行中的服务会在题库文件变化后自动重载，替换文件前先用它检查。
+    """
+    try:
+        bank = QuestionBank.load(args.path)
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    return {
+        "version": bank.version,
+        "scoring_version": bank.scoring.version,
+        "question_count": len(bank.questions),
+        "path": str(args.path),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    grouping = commands.add_parser("group-rooms", help="按答题结果把学生划分到寝室")
+    grouping.add_argument(
+        "codes",
+        type=argparse.FileType("r", encoding="utf-8"),
+        help="每行一个答题代码的文件，- 表示标准输入",
+    )
+    grouping.add_argument("--room-size", type=int, default=4, help="每间寝室人数")
+    grouping.add_argument(
+        "--time-budget", type=float, default=2.0, help="求解时间（秒）"
+    )
+    grouping.add_argument("--restarts", type=int, default=4, help="随机重启次数")
+    grouping.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="并行进程数"
+    )
+
+    rescoring = commands.add_parser(
+        "rescore", help="题库加分规则变化后重新计算已保存的答题结果"
+    )
+    rescoring.add_argument(
+        "--bank", type=Path, default=CONFIG.QUIZ_BANK_PATH, help="题库文件"
+    )
+    rescoring.add_argument(
+        "--chunk-size", type=int, default=5000, help="每次读取和写回的行数"
+    )
+    rescoring.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="并行计分的进程数"
+    )
+    rescoring.add_argument(
+        "--all",
+        action="store_true",
+        help="处理全部行（默认只处理版本与题库不一致的行）",
+    )
+
+    commands.add_parser(
+        "rebuild-stats", help="从答题记录重新计算答题统计（例如表结构变更之后）"
+    )
+
+    checking = commands.add_parser(
+        "check-bank", help="校验题库文件，服务会在文件变化后自动重载"
+    )
+    checking.add_argument("path", type=Path, help="题库文件（JSON 或 TOML）")
+
+    args = parser.parse_args(argv)
+    handlers = {
+        "group-rooms": group_rooms,
+        "rescore": rescore,
+        "rebuild-stats": rebuild_stats,
+        "check-bank": check_bank,
+    }
+    payload = asyncio.run(handlers[args.command](args))
+    json.dump(payload, sys.stdout, ensure_ascii=False, indent=2, default=str)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, Tuple
+
+Title = Tuple[str, str]  # (趣味称号, 称号评语)
+
+
+def _title(entry: Mapping[str, str]) -> Title:
+    return str(entry["title"]), str(entry["commentary"])
+
+
+def load_team_titles(
+    path: Path, dimensions: Iterable[str]
+) -> Tuple[Mapping[str, Title], Mapping[Tuple[str, str], Title]]:
+    """从随包发布的团队称号文件（question_banks/team_titles.json）读取称号表
+
+    返回 (单维度称号, 维度组合称号)，组合称号以排好序的 (维度, 维度) 为键；
+    两张表都是只读映射，加载题库时构建一次。文件缺失、格式错误或引用了题库中
+    不存在的维度时抛出 ValueError，与题库文件一样在启动时直接失败。
+    """
+    dimensions = set(dimensions)
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as exc:
+        raise ValueError(f"无法读取团队称号文件 {path}：{exc}") from exc
+
+    single: Dict[str, Title] = {}
+    combination: Dict[Tuple[str, str], Title] = {}
+    try:
+        for dimension, entry in data["single"].items():
+            single[dimension] = _title(entry)
+        for entry in data["combination"]:
+            pair = tuple(sorted(entry["dimensions"]))
+            if len(pair) != 2 or pair[0] == pair[1]:
+                raise ValueError(f"维度组合 {entry['dimensions']} 必须是两个不同的维度")
+            combination[pair] = _title(entry)
+    except (KeyError, TypeError, AttributeError) as exc:
+        raise ValueError(f"团队称号文件 {path} 格式错误：{exc!r}") from exc
+
+    unknown = (set(single) | {d for pair in combination for d in pair}) - dimensions
+    if unknown:
+        raise ValueError(
+            f"团队称号文件 {path} 引用了题库中不存在的维度：{'、'.join(sorted(unknown))}"
+        )
+    return MappingProxyType(single), MappingProxyType(combination)
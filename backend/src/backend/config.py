@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 
 from pydantic_settings import BaseSettings
 
@@ -9,11 +10,55 @@ class AppConfig(BaseSettings):
     LOG_LEVEL: str = "DEBUG"
     DEBUG: bool = False
     DATABASE_URI: str = "sqlite+aiosqlite:///./data/database/db.db"
+    DATABASE_POOL_SIZE: int = 10  # PostgreSQL 连接池常驻连接数
+    DATABASE_MAX_OVERFLOW: int = 20  # PostgreSQL 连接池满时允许临时多开的连接数
+    DATABASE_POOL_TIMEOUT: float = 30.0  # 等待空闲连接的超时时间（秒）
+    DATABASE_POOL_RECYCLE: int = 1800  # 连接的最长使用时间（秒），-1 表示不回收
+    SQLITE_POOL_SIZE: int = 5  # SQLite 连接池常驻连接数（同一时刻只有一个写入者）
+    SQLITE_MAX_OVERFLOW: int = 0  # SQLite 连接池满时允许临时多开的连接数
+    SQLITE_JOURNAL_MODE: Literal["WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY"] = (
+        "WAL"  # SQLite 日志模式，WAL 允许读写并发
+    )
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = (
+        "NORMAL"  # SQLite 同步级别，WAL 下 NORMAL 只在检查点时 fsync
+    )
+    SQLITE_BUSY_TIMEOUT: int = 10000  # SQLite 等待写锁的超时时间（毫秒）
+    SQLITE_CACHE_SIZE: int = -65536  # SQLite 页缓存大小，负数表示 KiB
+    SQLITE_MMAP_SIZE: int = 268435456  # SQLite 内存映射读取的最大字节数，0 表示关闭
     IMG_PATH: Path = Path("./data/images")
     LOG_PATH: Path = Path("./logs")
     IMAGE_BED_PATH: Path = Path("./data/images")
     PORT: int = 8000
     ARK_API_KEY: str | None = None
+    QUIZ_CODE_BLOCK_SIZE: int = 64  # 每个进程一次预留的答题代码数量
+    QUIZ_PROFILE_CACHE_SIZE: int = 4096  # 答题结果缓存的最大条目数
+    QUIZ_PROFILE_CACHE_TTL: float = 600.0  # 答题结果缓存的过期时间（秒）
+    QUIZ_COMPACT_STORAGE: bool = False  # 是否以紧凑二进制格式存储答案和特质分数
+    QUIZ_LAZY_SCORING: bool = False  # 是否只保存答案，读取时再计算特质分数和雷达图
+    QUIZ_MATCH_INDEX_GAP_TIMEOUT: float = (
+        60.0  # 匹配索引等待较小 ID 的答题结果提交的最长时间（秒）
+    )
+    QUIZ_GROUPING_WORKERS: int = 4  # 分寝求解时并行执行随机重启的进程数
+    QUIZ_GROUPING_PARALLEL_MIN: int = 200  # 人数不少于此值时才使用进程池并行求解
+    QUIZ_TEAM_TITLES_PATH: Path = (
+        Path(__file__).resolve().parent / "question_banks" / "team_titles.json"
+    )  # 团队称号文件（随包发布）
+    QUIZ_QUESTIONS_MAX_AGE: int = 300  # 题目列表响应允许客户端缓存的时长（秒）
+    QUIZ_BANK_PATH: Path = (
+        Path(__file__).resolve().parent / "question_banks" / "default.json"
+    )  # 题库文件（JSON 或 TOML）
+    QUIZ_BANK_WATCH_INTERVAL: float = (
+        5.0  # 检查题库文件变化的间隔（秒），0 表示不自动重载
+    )
+    WORDCLOUD_SNAPSHOT_TTL: float = 1.0  # 全局词云快照检查数据库变化的间隔（秒）
+    WORDCLOUD_STREAM_TICK: float = 0.25  # 词频变化推送的间隔（秒）
+    WORDCLOUD_TREND_MINUTES: int = 60  # 按分钟统计词频趋势的保留时长（分钟）
+    WORDCLOUD_TREND_HOURS: int = 48  # 按小时统计词频趋势的保留时长（小时）
+    WORDCLOUD_FREE_WORDS_ENABLED: bool = False  # 是否接受预设词汇以外的词
+    WORDCLOUD_FREE_WORDS_LIMIT: int = 500  # 预设词汇以外最多保留的不同词数
+    WORDCLOUD_DEDUP_ENABLED: bool = False  # 是否按 session_id 对词云选择去重
+    WORDCLOUD_DEDUP_CAPACITY: int = 100000  # 去重过滤器每一代记录的组合数
+    WORDCLOUD_DEDUP_ERROR_RATE: float = 0.001  # 去重过滤器的目标误判率
 
     class Config:
         env_file = ".env"  # 指定 .env 文件路径
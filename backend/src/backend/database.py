@@ -1,5 +1,7 @@
 from pathlib import Path
 
+from sqlalchemy import event, inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -14,8 +16,56 @@ if "sqlite" in SQLALCHEMY_DATABASE_URL:
         logger.warning(f"数据库目录 {DATABASE_URL.parent} 不存在，正在创建...")
         DATABASE_URL.parent.mkdir(parents=True)
 
+
+def _engine_options(url: str) -> dict:
+    """按数据库类型选择连接池参数
+
+    SQLite 同一时刻只允许一个写入者，连接多了只会在文件锁上轮询等待，所以使用
+    较小的连接池，并发请求在连接池中排队；PostgreSQL 使用较大的连接池，并在
+    取出连接时检测断线（pool_pre_ping）。SQLite 内存库只能共用单个连接，保持默认。
+    """
+    options = {
+        "pool_timeout": CONFIG.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": CONFIG.DATABASE_POOL_RECYCLE,
+    }
+    if "sqlite" in url:
+        if ":memory:" in url:
+            return {}
+        options.update(
+            pool_size=CONFIG.SQLITE_POOL_SIZE, max_overflow=CONFIG.SQLITE_MAX_OVERFLOW
+        )
+    else:
+        options.update(
+            pool_size=CONFIG.DATABASE_POOL_SIZE,
+            max_overflow=CONFIG.DATABASE_MAX_OVERFLOW,
+            pool_pre_ping=True,
+        )
+    return options
+
+
 # 创建异步引擎
-engine: AsyncEngine = create_async_engine(CONFIG.DATABASE_URI)
+engine: AsyncEngine = create_async_engine(
+    CONFIG.DATABASE_URI, **_engine_options(CONFIG.DATABASE_URI)
+)
+
+
+if engine.dialect.name == "sqlite":
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        """每个新建的 SQLite 连接都设置日志模式、同步级别、锁等待与缓存
+
+        WAL 模式下读写互不阻塞，synchronous=NORMAL 只在检查点时 fsync；
+        busy_timeout 让并发写入排队等待而不是立即报 database is locked。
+        """
+        cursor = dbapi_connection.cursor()
+        # 先设置锁等待，切换日志模式本身也需要拿到锁
+        cursor.execute(f"PRAGMA busy_timeout={int(CONFIG.SQLITE_BUSY_TIMEOUT)}")
+        cursor.execute(f"PRAGMA journal_mode={CONFIG.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={CONFIG.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size={int(CONFIG.SQLITE_CACHE_SIZE)}")
+        cursor.execute(f"PRAGMA mmap_size={int(CONFIG.SQLITE_MMAP_SIZE)}")
+        cursor.close()
 
 
 async_session = async_sessionmaker(engine, expire_on_commit=False)
@@ -23,9 +73,37 @@ async_session = async_sessionmaker(engine, expire_on_commit=False)
 Base = declarative_base()
 
 
+def upsert(table):
+    """按当前数据库方言构造 INSERT，以便使用 ON CONFLICT 子句（SQLite / PostgreSQL）"""
+    if engine.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def _add_missing_columns(conn):
+    """为已存在的表补上后来新增的可空列（create_all 不会修改已有表）"""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            logger.info(f"为表 {table.name} 添加列 {column.name}")
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(
+                text(
+                    f'ALTER TABLE "{table.name}" '
+                    f'ADD COLUMN "{column.name}" {column_type}'
+                )
+            )
+
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
 
 
 async def get_db():
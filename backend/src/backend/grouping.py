@@ -0,0 +1,290 @@
+"""分寝求解 - 把一批答题者划分为若干寝室，使各寝室团队匹配度之和最大
+
+寝室的团队匹配度是寝室内两两匹配度的平均值（与 calculate_team_compatibility
+一致）。两人的匹配度只取决于各自的主要特质，所以先把主要特质相同的人归为一类，
+只计算类与类之间的匹配度矩阵；求解过程全部是对这个小矩阵的查表。
+
+求解分两步：
+1. 贪心播种：按随机顺序取一个未分配的人作为寝室种子，之后每次加入与寝室现有
+   成员匹配度之和最大的人；
+2. 局部搜索：随机选取两个不同寝室的人，按增量公式计算交换前后两个寝室平均分的
+   变化，变好就交换，直到用完时间预算或长时间没有改进。
+
+多次随机重启在进程池中并行执行，取总分最高的一次。服务进程中的进程池
+（grouping_pool）在应用启动时创建一次，所有请求共用。
+
+命令行用法见 backend.cli 的 group-rooms 子命令。
+"""
+
+import random
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import (
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+# 连续这么多次（至少）交换尝试都没有改进时提前结束局部搜索
+MIN_STALL_PROPOSALS = 20000
+# 每隔这么多次交换尝试检查一次时间
+TIME_CHECK_INTERVAL = 256
+
+
+class RoomAssignment(NamedTuple):
+    """分寝结果：rooms 为每个寝室的成员下标，scores 为每个寝室的平均匹配度"""
+
+    rooms: List[List[int]]
+    scores: List[float]
+    total_score: float
+    restarts: int
+
+
+def build_score_matrix(
+    traits_list: Sequence[Mapping[str, str]],
+    compatibility: Callable[[Mapping[str, str], Mapping[str, str]], float],
+) -> Tuple[List[int], List[List[float]]]:
+    """把答题者按主要特质归类，返回 (每人所属类别, 类别之间的匹配度矩阵)"""
+    signature_ids: Dict[Hashable, int] = {}
+    representatives: List[Mapping[str, str]] = []
+    groups: List[int] = []
+    for traits in traits_list:
+        signature = frozenset((traits or {}).items())
+        group = signature_ids.get(signature)
+        if group is None:
+            group = signature_ids[signature] = len(representatives)
+            representatives.append(traits or {})
+        groups.append(group)
+
+    scores = [
+        [float(compatibility(a, b)) for b in representatives] for a in representatives
+    ]
+    return groups, scores
+
+
+def room_sizes(count: int, room_size: int) -> List[int]:
+    """每个寝室的人数：尽量住满，剩下的人单独一间"""
+    full, rest = divmod(count, room_size)
+    return [room_size] * full + ([rest] if rest else [])
+
+
+def _pair_count(size: int) -> int:
+    return size * (size - 1) // 2
+
+
+def _room_score(room: List[int], groups: List[int], scores: List[List[float]]) -> float:
+    """寝室内两两匹配度的平均值"""
+    pairs = _pair_count(len(room))
+    if not pairs:
+        return 0.0
+    total = 0.0
+    for a in range(len(room)):
+        row = scores[groups[room[a]]]
+        for b in range(a + 1, len(room)):
+            total += row[groups[room[b]]]
+    return total / pairs
+
+
+def _greedy_seed(
+    groups: List[int], scores: List[List[float]], room_size: int, rng: random.Random
+) -> List[List[int]]:
+    """贪心播种：逐个寝室加入与现有成员匹配度之和最大的人（按类别挑选）"""
+    group_count = len(scores)
+    members: List[List[int]] = [[] for _ in range(group_count)]
+    order = list(range(len(groups)))
+    rng.shuffle(order)
+    for student in order:
+        members[groups[student]].append(student)
+
+    assigned = [False] * len(groups)
+    cursor = 0
+    rooms: List[List[int]] = []
+    for size in room_sizes(len(groups), room_size):
+        while assigned[order[cursor]]:
+            cursor += 1
+        seed = order[cursor]
+        room = [seed]
+        assigned[seed] = True
+        members[groups[seed]].remove(seed)
+        # gain[h]：类别 h 的一个人与寝室现有成员的匹配度之和
+        gain = list(scores[groups[seed]])
+        while len(room) < size:
+            best_group, best_gain = -1, -1.0
+            for group in range(group_count):
+                if members[group] and gain[group] > best_gain:
+                    best_group, best_gain = group, gain[group]
+            student = members[best_group].pop()
+            assigned[student] = True
+            room.append(student)
+            row = scores[best_group]
+            for group in range(group_count):
+                gain[group] += row[group]
+        rooms.append(room)
+    return rooms
+
+
+def _local_search(
+    rooms: List[List[int]],
+    groups: List[int],
+    scores: List[List[float]],
+    deadline: float,
+    rng: random.Random,
+):
+    """随机两两交换的爬山搜索，原地修改 rooms"""
+    student_count = len(groups)
+    if len(rooms) < 2:
+        return
+    room_of = [0] * student_count
+    for index, room in enumerate(rooms):
+        for student in room:
+            room_of[student] = index
+    pair_counts = [_pair_count(len(room)) for room in rooms]
+
+    stall_limit = max(MIN_STALL_PROPOSALS, 20 * student_count)
+    stalled = 0
+    proposals = 0
+    randrange = rng.randrange
+    while stalled < stall_limit:
+        proposals += 1
+        if proposals % TIME_CHECK_INTERVAL == 0 and time.monotonic() >= deadline:
+            break
+        stalled += 1
+
+        i = randrange(student_count)
+        j = randrange(student_count)
+        room_a, room_b = room_of[i], room_of[j]
+        group_i, group_j = groups[i], groups[j]
+        if room_a == room_b or group_i == group_j:
+            continue
+
+        # 交换 i、j 后两个寝室平均分的变化量，只涉及这两个寝室的其他成员
+        row_i, row_j = scores[group_i], scores[group_j]
+        delta = 0.0
+        if pair_counts[room_a]:
+            change = 0.0
+            for k in rooms[room_a]:
+                if k != i:
+                    change += row_j[groups[k]] - row_i[groups[k]]
+            delta += change / pair_counts[room_a]
+        if pair_counts[room_b]:
+            change = 0.0
+            for k in rooms[room_b]:
+                if k != j:
+                    change += row_i[groups[k]] - row_j[groups[k]]
+            delta += change / pair_counts[room_b]
+
+        if delta > 1e-9:
+            members_a, members_b = rooms[room_a], rooms[room_b]
+            members_a[members_a.index(i)] = j
+            members_b[members_b.index(j)] = i
+            room_of[i], room_of[j] = room_b, room_a
+            stalled = 0
+
+
+def _solve_once(
+    groups: List[int],
+    scores: List[List[float]],
+    room_size: int,
+    time_budget: float,
+    seed: int,
+) -> Tuple[float, List[List[int]]]:
+    """一次随机重启：贪心播种后局部搜索，返回 (总分, 寝室划分)"""
+    deadline = time.monotonic() + time_budget
+    rng = random.Random(seed)
+    rooms = _greedy_seed(groups, scores, room_size, rng)
+    _local_search(rooms, groups, scores, deadline, rng)
+    total = sum(_room_score(room, groups, scores) for room in rooms)
+    return total, rooms
+
+
+def solve_rooms(
+    groups: List[int],
+    scores: List[List[float]],
+    room_size: int = 4,
+    time_budget: float = 2.0,
+    restarts: int = 4,
+    workers: int = 1,
+    executor: Optional[Executor] = None,
+) -> RoomAssignment:
+    """多次随机重启求解分寝，workers > 1 时并行
+
+    并行时使用传入的 executor（服务进程共用的进程池），未传入时临时创建一个
+    进程池。time_budget 是整个求解的大致墙钟时间，按并行轮数平分给每次重启。
+    """
+    if not groups:
+        return RoomAssignment([], [], 0.0, 0)
+
+    restarts = max(1, restarts)
+    workers = max(1, min(workers, restarts))
+    rounds = -(-restarts // workers)
+    budget = time_budget / rounds
+    seeds = [random.randrange(2**32) for _ in range(restarts)]
+
+    if workers == 1:
+        results = [
+            _solve_once(groups, scores, room_size, budget, seed) for seed in seeds
+        ]
+    elif executor is None:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = _solve_parallel(pool, groups, scores, room_size, budget, seeds)
+    else:
+        results = _solve_parallel(executor, groups, scores, room_size, budget, seeds)
+
+    total, rooms = max(results, key=lambda result: result[0])
+    room_scores = [_room_score(room, groups, scores) for room in rooms]
+    return RoomAssignment(rooms, room_scores, total, restarts)
+
+
+def _solve_parallel(
+    executor: Executor,
+    groups: List[int],
+    scores: List[List[float]],
+    room_size: int,
+    budget: float,
+    seeds: List[int],
+) -> List[Tuple[float, List[List[int]]]]:
+    futures = [
+        executor.submit(_solve_once, groups, scores, room_size, budget, seed)
+        for seed in seeds
+    ]
+    return [future.result() for future in futures]
+
+
+class GroupingPool:
+    """服务进程中分寝求解共用的进程池，由应用 lifespan 启动和关闭
+
+    只有人数不少于 min_students 时才值得付出进程间传输的开销，人数较少时
+    返回 None，由调用方在当前线程中串行求解。
+    """
+
+    def __init__(self):
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.workers = 1
+
+    def start(self, workers: int):
+        if self.executor is None and workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+            self.workers = workers
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            self.workers = 1
+
+    def for_students(
+        self, student_count: int, min_students: int
+    ) -> Optional[ProcessPoolExecutor]:
+        if student_count < min_students:
+            return None
+        return self.executor
+
+
+# 服务进程共用的分寝进程池
+grouping_pool = GroupingPool()
@@ -0,0 +1,103 @@
+"""特质匹配计算 - 把主要特质编码成位集，两两匹配度用位运算批量计算
+
+每个维度和每个 (维度, 特质) 各占一个比特位，一个人的主要特质编码为
+(维度位集, 特质位集)：两人共同维度数 = popcount(维度位集之与)，
+相同特质数 = popcount(特质位集之与)。
+"""
+
+import heapq
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+TraitBits = Tuple[int, int]  # (维度位集, 特质位集)
+
+
+class TraitEncoder:
+    """主要特质 -> (维度位集, 特质位集)，比特位在首次出现时分配"""
+
+    def __init__(self):
+        self._dimension_bits: Dict[str, int] = {}
+        self._trait_bits: Dict[Tuple[str, str], int] = {}
+
+    @staticmethod
+    def _bit(bits: Dict, key) -> int:
+        index = bits.get(key)
+        if index is None:
+            index = bits[key] = len(bits)
+        return 1 << index
+
+    def encode(self, primary_traits: Optional[Mapping[str, str]]) -> TraitBits:
+        dimension_mask = trait_mask = 0
+        for dimension, trait in (primary_traits or {}).items():
+            dimension_mask |= self._bit(self._dimension_bits, dimension)
+            trait_mask |= self._bit(self._trait_bits, (dimension, trait))
+        return dimension_mask, trait_mask
+
+
+def pair_compatibility(a: TraitBits, b: TraitBits) -> int:
+    """两人匹配度：共同维度上相同特质得1分、不同特质得0.5分，换算为百分比
+
+    与 calculate_trait_compatibility 的结果完全一致。
+    """
+    common = (a[0] & b[0]).bit_count()
+    if not common:
+        return 0
+    same = (a[1] & b[1]).bit_count()
+    return int((same + 0.5 * (common - same)) / common * 100)
+
+
+def shared_trait_ratio(a: TraitBits, b: TraitBits) -> int:
+    """相同特质数占两人中较多一方特质数的百分比（证书中的"最佳配对"）"""
+    larger = max(a[0].bit_count(), b[0].bit_count())
+    if not a[0] or not b[0]:
+        return 0
+    return int((a[1] & b[1]).bit_count() / larger * 100)
+
+
+class TeamMatrix:
+    """一组成员（2人寝室到整层楼）的特质位集与两两匹配度矩阵
+
+    主要特质相同的成员匹配度也相同，所以先按位集去重，只计算不同位集之间的
+    匹配度表，再按成员展开成完整的 N×N 矩阵。pair_score 决定矩阵中的两两得分，
+    默认为匹配度。
+    """
+
+    def __init__(
+        self,
+        traits_list: Iterable[Optional[Mapping[str, str]]],
+        pair_score: Callable[[TraitBits, TraitBits], int] = pair_compatibility,
+    ):
+        encoder = TraitEncoder()
+        self.traits: List[Mapping[str, str]] = [traits or {} for traits in traits_list]
+        self.bits: List[TraitBits] = [encoder.encode(traits) for traits in self.traits]
+
+        distinct = list(dict.fromkeys(self.bits))
+        slot_of = {bits: slot for slot, bits in enumerate(distinct)}
+        table = [[pair_score(a, b) for b in distinct] for a in distinct]
+        slots = [slot_of[bits] for bits in self.bits]
+        self.compatibility: List[List[int]] = [
+            [table[i][j] for j in slots] for i in slots
+        ]
+
+    def __len__(self) -> int:
+        return len(self.bits)
+
+    def pairs(self) -> Iterable[Tuple[int, int]]:
+        """所有成员对 (i, j)，i < j"""
+        size = len(self.bits)
+        return ((i, j) for i in range(size) for j in range(i + 1, size))
+
+    def average_compatibility(self) -> int:
+        """所有成员两两匹配度的平均值（取整）"""
+        size = len(self.bits)
+        pair_count = size * (size - 1) // 2
+        if not pair_count:
+            return 0
+        total = sum(sum(row[i + 1 :]) for i, row in enumerate(self.compatibility))
+        return int(total / pair_count)
+
+    def top_pairs(self, count: int) -> List[Tuple[int, int]]:
+        """按矩阵中的得分从高到低取前 count 对（部分排序，同分时保持成员顺序）"""
+        compatibility = self.compatibility
+        return heapq.nlargest(
+            count, self.pairs(), key=lambda pair: compatibility[pair[0]][pair[1]]
+        )
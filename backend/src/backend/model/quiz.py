@@ -1,9 +1,29 @@
-from sqlalchemy import String, JSON, DateTime
+import asyncio
+import hashlib
+import random
+import secrets
+import string
+import time
+from collections import OrderedDict, deque
+from sqlalchemy import (
+    String,
+    JSON,
+    DateTime,
+    Integer,
+    LargeBinary,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Mapped, mapped_column
-from typing import Dict, Optional, Any
+from typing import Deque, Dict, List, NamedTuple, Optional, Any, Tuple
 from datetime import datetime
 
-from ..database import Base
+from ..config import CONFIG
+from ..database import Base, engine
+from ..question_bank import MAX_VERSION_LENGTH, QuestionBank
+from ..scoring import ScoringTable
 
 
 class QuizResult(Base):
@@ -13,13 +33,32 @@ class QuizResult(Base):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     code: Mapped[str] = mapped_column(String(50), unique=True, index=True)
     participant_name: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
-    answers: Mapped[Dict[str, str]] = mapped_column(JSON)  # question_id: answer_index
-    trait_scores: Mapped[Dict[str, Dict[str, int]]] = mapped_column(
+    answers: Mapped[Optional[Dict[str, str]]] = mapped_column(
+        JSON
+    )  # question_id: answer_index
+    trait_scores: Mapped[Optional[Dict[str, Dict[str, int]]]] = mapped_column(
         JSON
     )  # 维度: {特质: 分数}
-    primary_traits: Mapped[Dict[str, str]] = mapped_column(JSON)  # 维度: 主要特质
-    radar_data: Mapped[Dict[str, Any]] = mapped_column(JSON)  # 雷达图数据
+    primary_traits: Mapped[Optional[Dict[str, str]]] = mapped_column(
+        JSON
+    )  # 维度: 主要特质
+    radar_data: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON)  # 雷达图数据
     submitted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    # 紧凑存储（QUIZ_COMPACT_STORAGE）：写入以下两列时 answers / trait_scores /
+    # radar_data 存 null，读取时由这两列还原
+    answers_packed: Mapped[Optional[bytes]] = mapped_column(
+        LargeBinary, nullable=True
+    )  # (问题ID, 选项下标) 字节对
+    trait_scores_packed: Mapped[Optional[bytes]] = mapped_column(
+        LargeBinary, nullable=True
+    )  # 按题库特质顺序排列的 int16 小端数组
+    # 写入时所用题库的计分版本；延迟计分（QUIZ_LAZY_SCORING）的行只保存答案，
+    # trait_scores / primary_traits / radar_data 在读取时按当前题库计算
+    scoring_version: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+    # 写入时所用题库文件声明的版本
+    bank_version: Mapped[Optional[str]] = mapped_column(
+        String(MAX_VERSION_LENGTH), nullable=True
+    )
 
 
 """
@@ -57,4 +96,346 @@ radar_data 字段示例：
     "scores": [85, 70, 60, 45, 80, 55, 75, 65],
     "max_score": 100
 }
+
+answers_packed 字段示例（与上面的 answers 等价）：
+b"\\x01\\x02\\x02\\x00"
 """
+
+# 紧凑答案格式中单个字节能表示的最大值
+PACKED_BYTE_MAX = 0xFF
+
+
+def pack_answers(answers: Dict[str, str]) -> Optional[bytes]:
+    """把答案打包成 (问题ID, 选项下标) 字节对
+
+    只有当每个键和值都是 0-255 的规范整数字符串时才打包，否则返回 None，
+    由调用方退回 JSON 存储，保证解包后与原始答案完全一致。
+    """
+    packed = bytearray()
+    for question_id, answer_index in answers.items():
+        if not (isinstance(question_id, str) and isinstance(answer_index, str)):
+            return None
+        if not (question_id.isdigit() and answer_index.isdigit()):
+            return None
+        qid, idx = int(question_id), int(answer_index)
+        if str(qid) != question_id or str(idx) != answer_index:
+            return None
+        if qid > PACKED_BYTE_MAX or idx > PACKED_BYTE_MAX:
+            return None
+        packed += bytes((qid, idx))
+    return bytes(packed)
+
+
+def unpack_answers(data: bytes) -> Dict[str, str]:
+    """把 (问题ID, 选项下标) 字节对还原为 answers 字典"""
+    return {str(data[i]): str(data[i + 1]) for i in range(0, len(data) - 1, 2)}
+
+
+class QuizCodeSequence(Base):
+    """答题代码分配序列（单行表）
+
+    代码由 next_index 经以 permutation_key 为密钥的 Feistel 置换映射得到，
+    各进程通过原子地推进 next_index 预留一段互不重叠的序号。密钥只保存在
+    数据库中，拿到若干个代码也推算不出其他已发放的代码。
+    """
+
+    __tablename__ = "quiz_code_sequence"
+    __table_args__ = {"extend_existing": True}
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    next_index: Mapped[int] = mapped_column(Integer, default=0)
+    # 旧版本使用仿射置换、没有密钥，首次使用时补上
+    permutation_key: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+
+
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 4
+CODE_HALF_SPACE = len(CODE_ALPHABET) ** (CODE_LENGTH // 2)
+CODE_SPACE = CODE_HALF_SPACE**2  # 36^4，恰好是两个半区的乘积
+FEISTEL_ROUNDS = 8
+
+
+class QuizCodeAllocator:
+    """答题代码分配器 - 不再逐个随机探测数据库
+
+    序号到代码是一个双射，所以只要序号不重复代码就不会重复；每次向数据库预留
+    一整段序号（多 worker 之间通过同一行的原子 UPDATE 互斥），之后从内存中
+    直接发放。代码空间用尽时退回到时间戳生成的长代码。
+
+    序号按 36^2 × 36^2 拆成两半，经过 FEISTEL_ROUNDS 轮以密钥化 BLAKE2b 为轮函数
+    的 Feistel 网络：每一轮都可逆，所以整体是 36^4 上的置换，不需要循环遍历；
+    没有密钥时相邻序号的代码之间看不出规律。
+    """
+
+    SEQUENCE_ID = 1
+
+    def __init__(self, block_size: int):
+        self.block_size = max(1, block_size)
+        self._key: Optional[bytes] = None
+        self._pending: Deque[str] = deque()
+        self._exhausted = False
+        self._lock = asyncio.Lock()
+
+    def _round(self, round_index: int, value: int) -> int:
+        digest = hashlib.blake2b(
+            bytes((round_index, value & 0xFF, value >> 8)), key=self._key, digest_size=8
+        ).digest()
+        return int.from_bytes(digest, "little") % CODE_HALF_SPACE
+
+    def _permute(self, index: int) -> int:
+        left, right = divmod(index, CODE_HALF_SPACE)
+        for round_index in range(FEISTEL_ROUNDS):
+            mixed = (left + self._round(round_index, right)) % CODE_HALF_SPACE
+            left, right = right, mixed
+        return left * CODE_HALF_SPACE + right
+
+    def _encode(self, index: int) -> str:
+        """把序号映射为4位代码"""
+        value = self._permute(index)
+        chars = []
+        for _ in range(CODE_LENGTH):
+            value, digit = divmod(value, len(CODE_ALPHABET))
+            chars.append(CODE_ALPHABET[digit])
+        return "".join(chars)
+
+    async def _load_sequence(self):
+        """读取置换密钥，首次运行（或从旧版本升级）时随机生成并持久化"""
+        async with engine.begin() as conn:
+            row = (
+                await conn.execute(
+                    select(QuizCodeSequence.permutation_key).where(
+                        QuizCodeSequence.id == self.SEQUENCE_ID
+                    )
+                )
+            ).one_or_none()
+        if row is not None and row[0] is not None:
+            self._key = bytes.fromhex(row[0])
+            return
+
+        key = secrets.token_hex(32)
+        if row is None:
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(
+                        insert(QuizCodeSequence).values(
+                            id=self.SEQUENCE_ID, next_index=0, permutation_key=key
+                        )
+                    )
+            except IntegrityError:
+                # 另一个 worker 已经抢先创建了序列
+                pass
+        else:
+            # 旧版本的序列：换成密钥置换后，新序号的代码可能与已发放的代码重合，
+            # 由 _reserve_block 按已有代码剔除
+            async with engine.begin() as conn:
+                await conn.execute(
+                    update(QuizCodeSequence)
+                    .where(
+                        QuizCodeSequence.id == self.SEQUENCE_ID,
+                        QuizCodeSequence.permutation_key.is_(None),
+                    )
+                    .values(permutation_key=key)
+                )
+        return await self._load_sequence()
+
+    async def _reserve_block(self, size: int) -> List[str]:
+        """原子地预留一段序号，并剔除与已有代码（旧版本生成的代码）冲突的部分"""
+        async with engine.begin() as conn:
+            await conn.execute(
+                update(QuizCodeSequence)
+                .where(QuizCodeSequence.id == self.SEQUENCE_ID)
+                .values(next_index=QuizCodeSequence.next_index + size)
+            )
+            end = (
+                await conn.execute(
+                    select(QuizCodeSequence.next_index).where(
+                        QuizCodeSequence.id == self.SEQUENCE_ID
+                    )
+                )
+            ).scalar_one()
+
+            start = end - size
+            if start >= CODE_SPACE:
+                self._exhausted = True
+                return []
+            codes = [self._encode(i) for i in range(start, min(end, CODE_SPACE))]
+
+            # 旧版本生成的代码可能落在本段中，每段只需一次 IN 查询
+            existing = set()
+            for chunk_start in range(0, len(codes), 500):
+                chunk = codes[chunk_start : chunk_start + 500]
+                result = await conn.execute(
+                    select(QuizResult.code).where(QuizResult.code.in_(chunk))
+                )
+                existing.update(result.scalars().all())
+        return [code for code in codes if code not in existing]
+
+    async def allocate(self, count: int = 1) -> List[str]:
+        """分配 count 个唯一代码"""
+        async with self._lock:
+            if self._key is None:
+                await self._load_sequence()
+            while len(self._pending) < count and not self._exhausted:
+                self._pending.extend(
+                    await self._reserve_block(
+                        max(self.block_size, count - len(self._pending))
+                    )
+                )
+            codes = [
+                self._pending.popleft() for _ in range(min(count, len(self._pending)))
+            ]
+
+        # 代码空间耗尽时，使用时间戳+随机数生成更长的唯一代码
+        timestamp = int(datetime.now().timestamp())
+        while len(codes) < count:
+            codes.append(f"{timestamp}{random.randint(1000, 9999)}{len(codes)}")
+        return codes
+
+
+# 初始化代码分配器实例
+code_allocator = QuizCodeAllocator(CONFIG.QUIZ_CODE_BLOCK_SIZE)
+
+
+class QuizProfile(NamedTuple):
+    """匹配接口使用的答题结果精简视图（提交后不再变化）"""
+
+    code: str
+    participant_name: Optional[str]
+    primary_traits: Dict[str, str]
+    trait_scores: Dict[str, Dict[str, int]]
+    radar_data: Dict[str, Any]
+
+
+def encode_quiz_row(row: Dict[str, Any], bank: QuestionBank) -> Dict[str, Any]:
+    """按存储模式把一行答题结果转换为要写入的列，并标记题库与计分版本
+
+    - 延迟计分（QUIZ_LAZY_SCORING）：只保存答案，派生字段读取时再计算；
+    - 紧凑存储（QUIZ_COMPACT_STORAGE）：answers 打包为 (问题ID, 选项下标) 字节对，
+      trait_scores 打包为按题库特质顺序排列的 int16 数组，radar_data 读取时由
+      特质分数重新计算；无法无损打包的字段仍按 JSON 存储。
+    """
+    row = {
+        **row,
+        "bank_version": bank.version,
+        "scoring_version": bank.scoring.version,
+    }
+    if CONFIG.QUIZ_LAZY_SCORING:
+        row.update(trait_scores=None, primary_traits=None, radar_data=None)
+    if CONFIG.QUIZ_COMPACT_STORAGE:
+        answers_packed = pack_answers(row["answers"])
+        if answers_packed is not None:
+            row.update(answers=None, answers_packed=answers_packed)
+        if row["trait_scores"] is not None:
+            trait_scores_packed = bank.scoring.pack_trait_scores(row["trait_scores"])
+            if trait_scores_packed is not None:
+                row.update(
+                    trait_scores=None,
+                    radar_data=None,
+                    trait_scores_packed=trait_scores_packed,
+                )
+    return row
+
+
+def decode_quiz_profile(
+    scoring: ScoringTable,
+    code,
+    participant_name,
+    primary_traits,
+    trait_scores,
+    radar_data,
+    trait_scores_packed,
+    answers,
+    answers_packed,
+    scoring_version,
+) -> QuizProfile:
+    """由数据库中的一行还原出接口使用的 QuizProfile（兼容 JSON、紧凑与延迟计分格式）
+
+    需要重新计分时（延迟计分的行，或由其他计分版本写入的紧凑行），特质分数、
+    主要特质和雷达图全部按当前题库从答案重新计算，不与存储的旧主要特质混用。
+    """
+    if trait_scores is None:
+        if trait_scores_packed is not None and not is_stale_packed_row(
+            scoring, trait_scores_packed, scoring_version
+        ):
+            trait_scores, _, radar_data = scoring.analyze_totals(
+                scoring.unpack_totals(trait_scores_packed)
+            )
+        else:
+            if answers is None:
+                answers = unpack_answers(answers_packed or b"")
+            trait_scores, primary_traits, radar_data = scoring.analyze(answers)
+    return QuizProfile(code, participant_name, primary_traits, trait_scores, radar_data)
+
+
+def is_stale_packed_row(
+    scoring: ScoringTable, trait_scores_packed, scoring_version
+) -> bool:
+    """紧凑存储的特质分数是否由其他计分版本写入，需要按答案重新计分
+
+    未标记版本的紧凑行写入于计分版本引入之前，特质顺序与当前题库一致。
+    """
+    return trait_scores_packed is not None and scoring_version not in (
+        None,
+        scoring.version,
+    )
+
+
+class QuizProfileCache:
+    """按代码缓存 QuizProfile 的 LRU，带 TTL 与命中统计"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max(0, max_size)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, QuizProfile]]" = OrderedDict()
+
+    def get_many(self, codes: List[str]) -> Dict[str, QuizProfile]:
+        """返回缓存中未过期的条目，未命中的代码不出现在结果中"""
+        now = time.monotonic()
+        found = {}
+        for code in codes:
+            entry = self._entries.get(code)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(code)
+                found[code] = entry[1]
+                self.hits += 1
+            else:
+                if entry is not None:
+                    del self._entries[code]
+                self.misses += 1
+        return found
+
+    def put(self, profile: QuizProfile):
+        """写入（或刷新）一个代码的缓存，超出容量时淘汰最久未使用的条目"""
+        if self.max_size == 0:
+            return
+        self._entries[profile.code] = (time.monotonic() + self.ttl, profile)
+        self._entries.move_to_end(profile.code)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, code: Optional[str] = None):
+        """清除指定代码的缓存；不指定时清空全部"""
+        if code is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(code, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存容量与命中统计"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0,
+        }
+
+
+# 初始化答题结果缓存实例
+profile_cache = QuizProfileCache(
+    CONFIG.QUIZ_PROFILE_CACHE_SIZE, CONFIG.QUIZ_PROFILE_CACHE_TTL
+)
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from ..matching import TraitEncoder, pair_compatibility
+
+# 最多同时等待的空缺 ID 数，防止序列大幅跳号时占用过多内存
+MAX_PENDING_IDS = 10000
+
+
+class MatchCandidate(NamedTuple):
+    """候选室友"""
+
+    code: str
+    participant_name: Optional[str]
+    compatibility_score: int
+    primary_traits: Dict[str, str]
+
+
+class TraitMatchIndex:
+    """全体答题者的主要特质索引 - 用于"寻找最佳室友"
+
+    每个人的主要特质编码为 (维度位集, 特质位集)，匹配度由位运算得到，
+    与 calculate_trait_compatibility 完全一致。
+
+    匹配度只取决于特质位集，所以主要特质相同的人归为一组（组数受维度与特质组合
+    限制，远小于人数）；查询时只给每组打一次分，再按分数从高到低取出组内代码。
+    新的答题结果按数据库自增 ID 增量加入，不做全表扫描。
+
+    自增 ID 的提交顺序不一定与分配顺序相同（PostgreSQL 中先分配 ID 的事务可能
+    后提交），所以 last_id 之下尚未出现的 ID 记为空缺，之后的刷新会再查一次；
+    超过等待时间仍未出现的空缺视为事务已回滚，不再等待。
+    """
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # 每次清空加一；清空不等待 lock，正在进行的刷新据此发现索引已被清空
+        self.generation = 0
+        self.clear()
+
+    def clear(self):
+        """清空索引，下次刷新时从头重新加载"""
+        self.generation += 1
+        self.last_id = 0  # 已加入索引的最大 quiz_results.id
+        self._pending: Dict[int, float] = {}  # last_id 之下尚未出现的 ID -> 发现时间
+        self._encoder = TraitEncoder()
+        # 代码 -> (姓名, 特质位集)
+        self._members: Dict[str, Tuple[Optional[str], int]] = {}
+        self._groups: Dict[int, List[str]] = {}  # 特质位集 -> 代码列表（按加入顺序）
+        self._group_dimensions: Dict[int, int] = {}  # 特质位集 -> 维度位集
+        self._group_traits: Dict[int, Dict[str, str]] = {}  # 特质位集 -> 主要特质
+
+    def add(
+        self, code: str, participant_name: Optional[str], primary_traits: Mapping
+    ) -> bool:
+        """加入一个答题者，代码已在索引中时返回 False"""
+        if code in self._members:
+            return False
+
+        dimension_mask, trait_mask = self._encoder.encode(primary_traits)
+
+        self._members[code] = (participant_name, trait_mask)
+        group = self._groups.get(trait_mask)
+        if group is None:
+            group = self._groups[trait_mask] = []
+            self._group_dimensions[trait_mask] = dimension_mask
+            self._group_traits[trait_mask] = dict(primary_traits or {})
+        group.append(code)
+        return True
+
+    def advance(self, row_id: int):
+        """记录已加入索引的行 ID，更新 last_id 和其下的空缺 ID"""
+        if row_id <= self.last_id:
+            self._pending.pop(row_id, None)
+            return
+        # 首次加载时更早的空缺来自已回滚或已删除的行，不必等待
+        if self.last_id:
+            now = time.monotonic()
+            start = max(self.last_id + 1, row_id - MAX_PENDING_IDS)
+            for missing in range(start, row_id):
+                self._pending[missing] = now
+            if len(self._pending) > MAX_PENDING_IDS:
+                for missing in sorted(self._pending)[:-MAX_PENDING_IDS]:
+                    del self._pending[missing]
+        self.last_id = row_id
+
+    def pending_ids(self, timeout: float) -> List[int]:
+        """返回仍在等待提交的空缺 ID，丢弃等待超过 timeout 秒的"""
+        deadline = time.monotonic() - timeout
+        for missing, found_at in list(self._pending.items()):
+            if found_at < deadline:
+                del self._pending[missing]
+        return sorted(self._pending)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._members
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def participant(self, code: str) -> Tuple[Optional[str], Dict[str, str]]:
+        """返回 (姓名, 主要特质)"""
+        participant_name, trait_mask = self._members[code]
+        return participant_name, self._group_traits[trait_mask]
+
+    def top_matches(self, code: str, limit: int) -> List[MatchCandidate]:
+        """返回与 code 匹配度最高的 limit 个其他答题者（不含没有共同维度的人）"""
+        _, trait_mask = self._members[code]
+        bits = (self._group_dimensions[trait_mask], trait_mask)
+
+        scored_groups = []
+        for group_mask, group_dimensions in self._group_dimensions.items():
+            # 没有共同维度时匹配度为 0，不作为候选
+            if not bits[0] & group_dimensions:
+                continue
+            score = pair_compatibility(bits, (group_dimensions, group_mask))
+            scored_groups.append((score, group_mask))
+        scored_groups.sort(key=lambda item: item[0], reverse=True)
+
+        candidates: List[MatchCandidate] = []
+        for score, group_mask in scored_groups:
+            traits = self._group_traits[group_mask]
+            for other in self._groups[group_mask]:
+                if other == code:
+                    continue
+                candidates.append(
+                    MatchCandidate(other, self._members[other][0], score, traits)
+                )
+                if len(candidates) >= limit:
+                    return candidates
+        return candidates
+
+
+match_index = TraitMatchIndex()
@@ -0,0 +1,262 @@
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional
+
+from sqlalchemy import (
+    DateTime,
+    Integer,
+    String,
+    case,
+    delete,
+    distinct,
+    func,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..database import Base, upsert
+from .quiz import QuizResult, unpack_answers
+
+
+class QuizStats(Base):
+    """答题统计的累计值（单行表），每次提交时原子递增"""
+
+    __tablename__ = "quiz_stats"
+    __table_args__ = {"extend_existing": True}
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    total_submissions: Mapped[int] = mapped_column(Integer, default=0)
+    total_participants: Mapped[int] = mapped_column(Integer, default=0)
+    scored_submissions: Mapped[int] = mapped_column(Integer, default=0)
+    score_sum: Mapped[int] = mapped_column(Integer, default=0)
+    last_submission_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime, nullable=True
+    )
+
+
+class QuizScoreBucket(Base):
+    """答题多样性得分直方图（得分 0-100 -> 人数）"""
+
+    __tablename__ = "quiz_score_buckets"
+    __table_args__ = {"extend_existing": True}
+
+    score: Mapped[int] = mapped_column(primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class QuizParticipantName(Base):
+    """出现过的参与者姓名，用于维护去重后的参与人数"""
+
+    __tablename__ = "quiz_participant_names"
+    __table_args__ = {"extend_existing": True}
+
+    name: Mapped[str] = mapped_column(String(100), primary_key=True)
+
+
+def answer_diversity_score(answers: Mapping[str, str]) -> Optional[int]:
+    """答案多样性得分：不同答案数 / 题目数，没有答案时返回 None"""
+    total_questions = len(answers)
+    if total_questions == 0:
+        return None
+    return int(len(set(answers.values())) / total_questions * 100)
+
+
+class QuizStatsAggregator:
+    """/quiz/stats 的增量统计
+
+    提交答题时在同一个事务中递增计数、直方图和去重姓名表，读取统计只需
+    读一行累计值和至多 101 个直方图桶，与答题记录总数无关。
+    """
+
+    STATS_ID = 1
+    TOP_RANKINGS = 10
+    CHUNK_SIZE = 1000  # 重新统计时每次从游标读取的行数
+
+    async def record(self, db: AsyncSession, rows: List[Dict[str, Any]]):
+        """把新插入的答题记录计入统计（需与插入处于同一事务）"""
+        if not rows:
+            return
+
+        histogram: Dict[int, int] = {}
+        score_sum = 0
+        for row in rows:
+            score = answer_diversity_score(row["answers"])
+            if score is not None:
+                histogram[score] = histogram.get(score, 0) + 1
+                score_sum += score
+        names = {row["participant_name"] for row in rows if row["participant_name"]}
+        last_submission_at = max(row["submitted_at"] for row in rows)
+
+        new_names = 0
+        if names:
+            result = await db.execute(
+                upsert(QuizParticipantName)
+                .on_conflict_do_nothing()
+                .returning(QuizParticipantName.name),
+                [{"name": name} for name in names],
+            )
+            new_names = len(result.scalars().all())
+
+        result = await db.execute(
+            update(QuizStats)
+            .where(QuizStats.id == self.STATS_ID)
+            .values(
+                total_submissions=QuizStats.total_submissions + len(rows),
+                total_participants=QuizStats.total_participants + new_names,
+                scored_submissions=QuizStats.scored_submissions
+                + sum(histogram.values()),
+                score_sum=QuizStats.score_sum + score_sum,
+                last_submission_at=case(
+                    (
+                        QuizStats.last_submission_at.is_(None)
+                        | (QuizStats.last_submission_at < last_submission_at),
+                        last_submission_at,
+                    ),
+                    else_=QuizStats.last_submission_at,
+                ),
+            )
+        )
+        if result.rowcount == 0:
+            # 统计尚未建立，之后 rebuild 会从答题记录中完整统计
+            return
+
+        if histogram:
+            statement = upsert(QuizScoreBucket)
+            await db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[QuizScoreBucket.score],
+                    set_={"count": QuizScoreBucket.count + statement.excluded.count},
+                ),
+                [
+                    {"score": score, "count": count}
+                    for score, count in histogram.items()
+                ],
+            )
+
+    async def rebuild(self, db: AsyncSession):
+        """从 quiz_results 重新计算全部统计
+
+        计数、去重人数和最后提交时间交给数据库聚合；多样性得分需要解析 answers，
+        只流式读取这一列并按 CHUNK_SIZE 分块处理，内存占用与总行数无关。
+        """
+        # 先清空（同时拿到写锁），避免与并发提交交错
+        await db.execute(delete(QuizStats))
+        await db.execute(delete(QuizScoreBucket))
+        await db.execute(delete(QuizParticipantName))
+
+        participant_name = func.nullif(QuizResult.participant_name, "")
+        total_submissions, total_participants, last_submission_at = (
+            await db.execute(
+                select(
+                    func.count(),
+                    func.count(distinct(participant_name)),
+                    func.max(QuizResult.submitted_at),
+                )
+            )
+        ).one()
+
+        histogram: Dict[int, int] = {}
+        result = await db.stream(
+            select(QuizResult.answers, QuizResult.answers_packed).execution_options(
+                yield_per=self.CHUNK_SIZE
+            )
+        )
+        async for chunk in result.partitions():
+            for answers, answers_packed in chunk:
+                if answers is None and answers_packed is not None:
+                    answers = unpack_answers(answers_packed)
+                score = answer_diversity_score(answers or {})
+                if score is not None:
+                    histogram[score] = histogram.get(score, 0) + 1
+
+        await db.execute(
+            insert(QuizStats).values(
+                id=self.STATS_ID,
+                total_submissions=total_submissions,
+                total_participants=total_participants,
+                scored_submissions=sum(histogram.values()),
+                score_sum=sum(score * count for score, count in histogram.items()),
+                last_submission_at=last_submission_at,
+            )
+        )
+        if histogram:
+            await db.execute(
+                insert(QuizScoreBucket),
+                [
+                    {"score": score, "count": count}
+                    for score, count in histogram.items()
+                ],
+            )
+        await db.execute(
+            insert(QuizParticipantName).from_select(
+                ["name"],
+                select(participant_name)
+                .where(participant_name.is_not(None))
+                .distinct(),
+            )
+        )
+
+    async def ensure_built(self, db: AsyncSession):
+        """统计表不存在时（首次部署）从答题记录构建一次"""
+        result = await db.execute(
+            select(QuizStats.id).where(QuizStats.id == self.STATS_ID)
+        )
+        if result.scalar_one_or_none() is not None:
+            return
+        try:
+            await self.rebuild(db)
+            await db.commit()
+        except IntegrityError:
+            # 另一个 worker 已经完成了构建
+            await db.rollback()
+
+    async def snapshot(self, db: AsyncSession) -> Optional[Dict[str, Any]]:
+        """读取当前统计，没有任何答题记录时返回 None"""
+        result = await db.execute(
+            select(
+                QuizStats.total_submissions,
+                QuizStats.total_participants,
+                QuizStats.scored_submissions,
+                QuizStats.score_sum,
+                QuizStats.last_submission_at,
+            ).where(QuizStats.id == self.STATS_ID)
+        )
+        stats = result.one_or_none()
+        if stats is None or stats.total_submissions == 0:
+            return None
+
+        result = await db.execute(
+            select(QuizScoreBucket.score, QuizScoreBucket.count)
+            .where(QuizScoreBucket.count > 0)
+            .order_by(QuizScoreBucket.score.desc())
+        )
+        buckets = result.all()
+
+        # 计算排名：从高分桶依次取，只显示前10名
+        match_rankings = {}
+        for score, count in buckets:
+            for _ in range(count):
+                if len(match_rankings) >= self.TOP_RANKINGS:
+                    break
+                match_rankings[f"第{len(match_rankings) + 1}名"] = score
+
+        average_match_score = (
+            stats.score_sum / stats.scored_submissions
+            if stats.scored_submissions
+            else 0
+        )
+        return {
+            "total_participants": stats.total_participants,
+            "total_submissions": stats.total_submissions,
+            "average_match_score": round(average_match_score, 2),
+            "best_match_score": buckets[0][0] if buckets else 0,
+            "last_submission_time": stats.last_submission_at,
+            "top_rankings": match_rankings,
+        }
+
+
+# 初始化答题统计实例
+quiz_stats = QuizStatsAggregator()
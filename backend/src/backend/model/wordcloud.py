@@ -1,65 +1,568 @@
+import asyncio
+import hashlib
 import json
+import math
 import os
-from datetime import datetime
-from typing import List, Optional
+import time
+import unicodedata
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import (
+    AsyncIterator,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+from sqlalchemy import DateTime, Integer, String, delete, func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+from ..config import CONFIG
+from ..database import Base, async_session, upsert
+from ..logger import logger
 from ..schema.wordcloud import WordCloudEntry
 
 
+class WordFrequency(Base):
+    """词频表：词 -> 被选择的次数"""
+
+    __tablename__ = "word_frequencies"
+    __table_args__ = {"extend_existing": True}
+
+    word: Mapped[str] = mapped_column(String(100), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class WordTrendBucket(Base):
+    """按时间分桶的词频：每分钟一个桶，同时累加到所在小时的桶
+
+    分钟桶只保留 WORDCLOUD_TREND_MINUTES 分钟，小时桶只保留
+    WORDCLOUD_TREND_HOURS 小时，表大小与提交总量无关。
+    """
+
+    __tablename__ = "word_trend_buckets"
+    __table_args__ = {"extend_existing": True}
+
+    span: Mapped[int] = mapped_column(Integer, primary_key=True)  # 桶长度（秒）
+    bucket: Mapped[datetime] = mapped_column(DateTime, primary_key=True)  # 桶起点
+    word: Mapped[str] = mapped_column(String(100), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+
+MINUTE = 60
+HOUR = 3600
+
+
+class BloomFilter:
+    """定长位数组的布隆过滤器（只增不删）"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.size = max(
+            8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))
+        )
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key: str):
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def false_positive_rate(self) -> float:
+        """按当前已插入数量估算的误判率"""
+        return (1 - math.exp(-self.hash_count * self.count / self.size)) ** (
+            self.hash_count
+        )
+
+
+class SessionWordFilter:
+    """(session_id, 词) 去重过滤器
+
+    使用新旧两代布隆过滤器轮换：当前代写满 capacity 后成为旧一代，旧一代被丢弃，
+    因此内存固定为两个过滤器的大小，并且至少记住最近 capacity 个组合。
+    布隆过滤器可能误判（把新组合当作重复），不会漏判。
+
+    组合先通过 reserve 预留，写入数据库并提交成功后才 commit 进过滤器；
+    提交失败时 release，客户端重试不会被当作重复。预留中的组合同样视为重复，
+    同一 session 的并发请求不会重复计数。
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rejected = 0
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous: Optional[BloomFilter] = None
+        self._pending: Set[str] = set()
+
+    @staticmethod
+    def _key(session_id: str, word: str) -> str:
+        return f"{session_id}\x00{word}"
+
+    def _seen(self, key: str) -> bool:
+        return (
+            key in self._pending
+            or key in self._current
+            or (self._previous is not None and key in self._previous)
+        )
+
+    def reserve(self, session_id: str, words: Iterable[str]) -> List[str]:
+        """返回第一次出现的词并预留，重复的词计入 rejected"""
+        fresh = []
+        for word in words:
+            key = self._key(session_id, word)
+            if self._seen(key):
+                self.rejected += 1
+                continue
+            self._pending.add(key)
+            fresh.append(word)
+        return fresh
+
+    def commit(self, session_id: str, words: Iterable[str]):
+        """写入已成功提交的组合"""
+        for word in words:
+            key = self._key(session_id, word)
+            self._pending.discard(key)
+            if self._current.count >= self.capacity:
+                self._previous = self._current
+                self._current = BloomFilter(self.capacity, self.error_rate)
+            self._current.add(key)
+
+    def release(self, session_id: str, words: Iterable[str]):
+        """放弃未能提交的预留"""
+        for word in words:
+            self._pending.discard(self._key(session_id, word))
+
+    def stats(self) -> Dict[str, float]:
+        """误判率估算与内存占用"""
+        filters = [f for f in (self._current, self._previous) if f is not None]
+        not_false_positive = 1.0
+        for bloom in filters:
+            not_false_positive *= 1 - bloom.false_positive_rate()
+        return {
+            "capacity": self.capacity,
+            "target_error_rate": self.error_rate,
+            "estimated_false_positive_rate": round(1 - not_false_positive, 6),
+            "tracked_pairs": sum(f.count for f in filters),
+            "rejected": self.rejected,
+            "memory_bytes": sum(len(f.bits) for f in filters),
+        }
+
+
 class WordCloudStorage:
-    """词云数据存储类"""
+    """词云数据存储类
+
+    词频保存在数据库中，每次保存用一条 INSERT ... ON CONFLICT DO UPDATE
+    原子累加，多个 worker 共享同一份数据。
+    """
 
-    def __init__(self):
+    # 最多缓存多少种不同 top 参数的序列化结果
+    MAX_CACHED_PAYLOADS = 16
+    # 自由词的最大长度
+    FREE_WORD_MAX_LENGTH = 20
+
+    def __init__(
+        self,
+        snapshot_ttl: float = CONFIG.WORDCLOUD_SNAPSHOT_TTL,
+        trend_minutes: int = CONFIG.WORDCLOUD_TREND_MINUTES,
+        trend_hours: int = CONFIG.WORDCLOUD_TREND_HOURS,
+        dedup_enabled: bool = CONFIG.WORDCLOUD_DEDUP_ENABLED,
+        free_words_enabled: bool = CONFIG.WORDCLOUD_FREE_WORDS_ENABLED,
+        free_words_limit: int = CONFIG.WORDCLOUD_FREE_WORDS_LIMIT,
+    ):
+        # 旧版本使用的 JSON 文件，只在词频表为空时导入一次
         self.storage_file = "wordcloud_data.json"
-        self.data = self._load_data()
 
-    def _load_data(self):
-        """加载词云数据"""
+        # 时间窗口趋势：分钟桶与小时桶的保留时长，过期桶每分钟最多清理一次
+        self.trend_minutes = trend_minutes
+        self.trend_hours = trend_hours
+        self._trend_pruned_at = float("-inf")
+
+        # 默认只接受预设词汇；开启自由词模式后，预设以外的不同词最多 free_words_limit 个
+        self.free_words_enabled = free_words_enabled
+        self.free_words_limit = free_words_limit
+        self._free_words: set = set()
+
+        # 可选的 (session_id, 词) 去重，只在进程内存中判断，不查询数据库
+        self.dedup_filter: Optional[SessionWordFilter] = (
+            SessionWordFilter(
+                CONFIG.WORDCLOUD_DEDUP_CAPACITY, CONFIG.WORDCLOUD_DEDUP_ERROR_RATE
+            )
+            if dedup_enabled
+            else None
+        )
+
+        # 全局词云快照：按词频降序排好的词表，以及按 top 缓存的 (JSON 字节, ETag)
+        self.snapshot_ttl = snapshot_ttl
+        self.snapshot_version = 0
+        self._snapshot_signature: Optional[Tuple[int, int]] = None
+        self._frequencies: Dict[str, int] = {}
+        self._sorted_words: List[Tuple[str, int]] = []
+        self._payloads: Dict[Optional[int], Tuple[bytes, str]] = {}
+        self._snapshot_checked_at = float("-inf")
+        self._snapshot_lock = asyncio.Lock()
+
+    def _load_legacy_data(self) -> dict:
+        """加载旧版本 JSON 文件中的词频数据"""
         try:
             if os.path.exists(self.storage_file):
                 with open(self.storage_file, "r", encoding="utf-8") as f:
                     data = json.load(f)
-                    # 兼容旧版本数据格式，确保有word_frequencies字段
-                    if "word_frequencies" not in data:
-                        data["word_frequencies"] = {}
-                    return data
+                    return data.get("word_frequencies", {})
         except Exception as e:
             print(f"加载词云数据失败: {e}")
-        return {"word_frequencies": {}}
+        return {}
 
-    def _save_data(self):
-        """保存词云数据到文件"""
+    async def import_legacy_data(self, db: AsyncSession):
+        """词频表为空时，把旧版本 JSON 文件中的词频导入数据库"""
+        existing = await db.execute(select(func.count()).select_from(WordFrequency))
+        if existing.scalar_one():
+            return
+
+        word_frequencies = self._load_legacy_data()
+        if not word_frequencies:
+            return
         try:
-            with open(self.storage_file, "w", encoding="utf-8") as f:
-                json.dump(self.data, f, ensure_ascii=False, default=str)
-        except Exception as e:
-            print(f"保存词云数据失败: {e}")
-
-    def add_entry(self, entry: WordCloudEntry) -> str:
-        """添加词云条目 - 只更新词频统计，不保存具体条目"""
-        # 更新词频统计
-        for word in entry.words:
-            if word in self.data["word_frequencies"]:
-                self.data["word_frequencies"][word] += 1
-            else:
-                self.data["word_frequencies"][word] = 1
+            # 使用普通 INSERT：若其他 worker 已导入则主键冲突，直接放弃
+            await db.execute(
+                insert(WordFrequency),
+                [
+                    {"word": word, "count": int(count)}
+                    for word, count in word_frequencies.items()
+                ],
+            )
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
 
-        # 保存到文件
-        self._save_data()
-        return "success"
+    async def validate_words(self, db: AsyncSession, words: List[str]) -> List[str]:
+        """规范化提交的词并校验，不接受的词抛出 ValueError"""
+        normalized = [normalize_word(word) for word in words]
+        unknown = list(
+            dict.fromkeys(word for word in normalized if word not in PRESET_WORD_SET)
+        )
+        if not unknown:
+            return normalized
 
-    def get_all_word_frequencies(self) -> List[dict]:
+        if not self.free_words_enabled:
+            raise ValueError(f"不支持的词汇: {'、'.join(unknown)}")
+        invalid = [
+            word
+            for word in unknown
+            if not word or len(word) > self.FREE_WORD_MAX_LENGTH
+        ]
+        if invalid:
+            raise ValueError(f"自由词长度需在1-{self.FREE_WORD_MAX_LENGTH}个字符之间")
+
+        new_words = [word for word in unknown if word not in self._free_words]
+        if new_words:
+            # 本进程没见过的自由词才查询一次已有的自由词（至多 free_words_limit 个）
+            result = await db.execute(
+                select(WordFrequency.word).where(
+                    WordFrequency.word.not_in(PRESET_WORDS)
+                )
+            )
+            self._free_words = set(result.scalars().all())
+            new_words = [word for word in new_words if word not in self._free_words]
+            if len(self._free_words) + len(new_words) > self.free_words_limit:
+                raise ValueError("自由词数量已达上限，请从预设词汇中选择")
+            self._free_words.update(new_words)
+        return normalized
+
+    async def add_entry(self, db: AsyncSession, entry: WordCloudEntry) -> int:
+        """添加词云条目 - 只更新词频统计，不保存具体条目
+
+        提交的词先规范化并按预设词汇集合校验（不接受时抛出 ValueError）。
+        返回实际计入的词数；开启去重时同一 session 重复选择的词不再计数。
+        """
+        words = await self.validate_words(db, entry.words)
+        dedup_filter = self.dedup_filter if entry.session_id else None
+        if dedup_filter is not None:
+            increments = Counter(
+                dedup_filter.reserve(entry.session_id, dict.fromkeys(words))
+            )
+            if not increments:
+                return 0
+        else:
+            increments = Counter(words)
+
+        committed = False
+        try:
+            statement = upsert(WordFrequency)
+            await db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[WordFrequency.word],
+                    set_={"count": WordFrequency.count + statement.excluded.count},
+                ),
+                [{"word": word, "count": count} for word, count in increments.items()],
+            )
+            await self._record_trend(db, increments)
+            await db.commit()
+            committed = True
+        finally:
+            if dedup_filter is not None:
+                if committed:
+                    dedup_filter.commit(entry.session_id, increments)
+                else:
+                    dedup_filter.release(entry.session_id, increments)
+        # 本进程的写入让快照立即失效，其他 worker 的写入在 TTL 内被发现
+        self._snapshot_checked_at = float("-inf")
+        return sum(increments.values())
+
+    async def _record_trend(self, db: AsyncSession, increments: Counter):
+        """把本次选择累加到服务器接收时间所在的分钟桶和小时桶
+
+        不使用客户端上报的 created_at：客户端时钟不可信，按它分桶可以把选择
+        写进任意历史时间段。
+        """
+        minute = datetime.now().replace(second=0, microsecond=0)
+        hour = minute.replace(minute=0)
+        statement = upsert(WordTrendBucket)
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[
+                    WordTrendBucket.span,
+                    WordTrendBucket.bucket,
+                    WordTrendBucket.word,
+                ],
+                set_={"count": WordTrendBucket.count + statement.excluded.count},
+            ),
+            [
+                {"span": span, "bucket": bucket, "word": word, "count": count}
+                for span, bucket in ((MINUTE, minute), (HOUR, hour))
+                for word, count in increments.items()
+            ],
+        )
+
+        if time.monotonic() - self._trend_pruned_at >= MINUTE:
+            self._trend_pruned_at = time.monotonic()
+            now = datetime.now()
+            await db.execute(
+                delete(WordTrendBucket).where(
+                    or_(
+                        (WordTrendBucket.span == MINUTE)
+                        & (
+                            WordTrendBucket.bucket
+                            < now - timedelta(minutes=self.trend_minutes)
+                        ),
+                        (WordTrendBucket.span == HOUR)
+                        & (
+                            WordTrendBucket.bucket
+                            < now - timedelta(hours=self.trend_hours)
+                        ),
+                    )
+                )
+            )
+
+    async def get_trending_payload(
+        self, db: AsyncSession, window: int, top: Optional[int] = None
+    ) -> Tuple[bytes, str]:
+        """返回最近 window 分钟内的词频 (JSON 字节, ETag)，按词频降序排列
+
+        窗口不超过分钟桶保留时长时按分钟桶精确统计，否则按小时桶统计
+        （向上取整到整小时）；只需汇总窗口内的桶，不回溯全部历史。
+        """
+        now = datetime.now().replace(second=0, microsecond=0)
+        if window <= self.trend_minutes:
+            span, start = MINUTE, now - timedelta(minutes=window - 1)
+        else:
+            hours = -(-window // 60)
+            span, start = HOUR, now.replace(minute=0) - timedelta(hours=hours - 1)
+
+        total = func.sum(WordTrendBucket.count)
+        statement = (
+            select(WordTrendBucket.word, total)
+            .where(WordTrendBucket.span == span, WordTrendBucket.bucket >= start)
+            .group_by(WordTrendBucket.word)
+            .order_by(total.desc())
+        )
+        if top is not None:
+            statement = statement.limit(top)
+        result = await db.execute(statement)
+        return self._encode_words(result.all())
+
+    @staticmethod
+    def _encode_words(words: List[Tuple[str, int]]) -> Tuple[bytes, str]:
+        """序列化为前端需要的 [{"text", "value"}] 格式，并计算内容 ETag"""
+        body = json.dumps(
+            [{"text": word, "value": freq} for word, freq in words],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        return body, f'"{hashlib.md5(body).hexdigest()}"'
+
+    async def get_all_word_frequencies(self, db: AsyncSession) -> List[dict]:
         """获取所有词频数据"""
+        result = await db.execute(select(WordFrequency.word, WordFrequency.count))
         # 转换词频数据为前端需要的格式
-        return [
-            {"text": word, "value": freq}
-            for word, freq in self.data["word_frequencies"].items()
-        ]
+        return [{"text": word, "value": freq} for word, freq in result.all()]
+
+    async def _refresh_snapshot(self, db: AsyncSession):
+        """词频有变化时重新读取并排序，没有变化时只做一次聚合查询"""
+        result = await db.execute(
+            select(func.count(), func.coalesce(func.sum(WordFrequency.count), 0))
+        )
+        # 词频只增不减，(词数, 总次数) 不变即说明内容没有变化
+        signature = tuple(result.one())
+        self._snapshot_checked_at = time.monotonic()
+        if signature == self._snapshot_signature:
+            return
+
+        result = await db.execute(select(WordFrequency.word, WordFrequency.count))
+        word_frequencies = result.all()
+        self._frequencies = dict(word_frequencies)
+        if word_frequencies:
+            self._sorted_words = sorted(word_frequencies, key=lambda x: -x[1])
+        else:
+            # 如果还没有数据，返回预设词汇作为示例
+            self._sorted_words = [
+                (word, 10 + i % 20) for i, word in enumerate(PRESET_WORDS[:20])
+            ]
+        self._snapshot_signature = signature
+        self.snapshot_version += 1
+        self._payloads.clear()
+
+    async def _ensure_snapshot(self, db: AsyncSession):
+        if time.monotonic() - self._snapshot_checked_at >= self.snapshot_ttl:
+            await self._refresh_snapshot(db)
+
+    async def get_word_frequencies(self, db: AsyncSession) -> Dict[str, int]:
+        """返回当前词频快照（只读，与全局词云共享刷新逻辑）"""
+        async with self._snapshot_lock:
+            await self._ensure_snapshot(db)
+            return self._frequencies
+
+    async def get_global_payload(
+        self, db: AsyncSession, top: Optional[int] = None
+    ) -> Tuple[bytes, str]:
+        """返回全局词云的 (JSON 字节, ETag)，只在词频变化后重新序列化"""
+        async with self._snapshot_lock:
+            await self._ensure_snapshot(db)
+
+            payload = self._payloads.get(top)
+            if payload is None:
+                words = self._sorted_words if top is None else self._sorted_words[:top]
+                if len(self._payloads) >= self.MAX_CACHED_PAYLOADS:
+                    self._payloads.clear()
+                payload = self._payloads[top] = self._encode_words(words)
+            return payload
 
     def get_entry_by_id(self, entry_id: str) -> Optional[dict]:
         """根据ID获取词云条目 - 已弃用，不再保存具体条目"""
         return None
 
 
+class WordCloudBroadcaster:
+    """词频变化的 SSE 广播器
+
+    单个后台任务按固定间隔对比词频快照，把这一段时间内的全部变化合并成一帧
+    并只序列化一次；所有订阅者等待同一个 asyncio.Event，被唤醒后从最近的
+    帧历史中取自己还没发送的帧，不为每条消息或每个订阅者创建任务和队列。
+    """
+
+    HISTORY_SIZE = 64  # 保留的最近帧数，落后更多的订阅者会收到 reset 事件
+    KEEPALIVE_TICKS = 60  # 连续多少个空闲 tick 后发送一次心跳注释
+
+    def __init__(
+        self,
+        storage: WordCloudStorage,
+        tick_interval: float = CONFIG.WORDCLOUD_STREAM_TICK,
+    ):
+        self.storage = storage
+        self.tick_interval = tick_interval
+        self.subscribers = 0
+        self._sequence = 0
+        self._frames: Deque[Tuple[int, bytes]] = deque(maxlen=self.HISTORY_SIZE)
+        self._updated = asyncio.Event()
+        self._last_frequencies: Optional[Dict[str, int]] = None
+
+    def _publish(self, frame: bytes):
+        self._sequence += 1
+        self._frames.append((self._sequence, frame))
+        # 换上新的 Event 再唤醒等待旧 Event 的全部订阅者
+        updated, self._updated = self._updated, asyncio.Event()
+        updated.set()
+
+    async def _tick(self):
+        async with async_session() as db:
+            frequencies = await self.storage.get_word_frequencies(db)
+
+        previous = self._last_frequencies
+        self._last_frequencies = frequencies
+        if previous is None or frequencies is previous:
+            return {}
+        return {
+            word: count - previous.get(word, 0)
+            for word, count in frequencies.items()
+            if count != previous.get(word, 0)
+        }
+
+    async def run(self):
+        """后台广播循环，由应用 lifespan 启动"""
+        idle_ticks = 0
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            if not self.subscribers:
+                # 没有订阅者时不查询数据库，下次有人订阅时重新建立基线
+                self._last_frequencies = None
+                continue
+
+            try:
+                deltas = await self._tick()
+            except Exception:
+                logger.exception("词频广播失败")
+                continue
+
+            if deltas:
+                idle_ticks = 0
+                data = json.dumps(
+                    [{"text": word, "delta": delta} for word, delta in deltas.items()],
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                )
+                frame = f"id: {self._sequence + 1}\nevent: delta\ndata: {data}\n\n"
+                self._publish(frame.encode("utf-8"))
+            else:
+                idle_ticks += 1
+                if idle_ticks >= self.KEEPALIVE_TICKS:
+                    idle_ticks = 0
+                    self._publish(b": keep-alive\n\n")
+
+    async def subscribe(self) -> AsyncIterator[bytes]:
+        """订阅词频变化，逐段产出 SSE 数据"""
+        self.subscribers += 1
+        try:
+            last_seen = self._sequence
+            yield f"retry: {int(self.tick_interval * 4000)}\n\n".encode("utf-8")
+            while True:
+                if self._sequence == last_seen:
+                    await self._updated.wait()
+                frames = [frame for seq, frame in self._frames if seq > last_seen]
+                if self._frames and self._frames[0][0] > last_seen + 1:
+                    # 落后太多、中间的帧已被丢弃，让客户端重新拉取全量词云
+                    frames.insert(0, b"event: reset\ndata: {}\n\n")
+                last_seen = self._sequence
+                yield b"".join(frames)
+        finally:
+            self.subscribers -= 1
+
+
 # 预设词汇列表
 PRESET_WORDS = [
     "带饭侠",
@@ -104,5 +607,17 @@ PRESET_WORDS = [
 ]
 
 
+# 预设词汇集合（按 NFKC 规范化），启动时构建一次，用于校验提交的词
+PRESET_WORD_SET: FrozenSet[str] = frozenset(
+    unicodedata.normalize("NFKC", word) for word in PRESET_WORDS
+)
+
+
+def normalize_word(word: str) -> str:
+    """统一全角/半角等写法并去掉首尾空白"""
+    return unicodedata.normalize("NFKC", word).strip()
+
+
 # 初始化存储实例
 wordcloud_storage = WordCloudStorage()
+wordcloud_broadcaster = WordCloudBroadcaster(wordcloud_storage)
@@ -0,0 +1,73 @@
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, Tuple
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # brotli 是可选依赖，未安装时只提供 gzip
+    brotli = None
+
+
+class PrerenderedJSON:
+    """预先序列化并压缩好的 JSON 响应（内容不变时所有请求共用同一份字节）
+
+    启动时序列化一次，同时准备 gzip（以及安装了 brotli 时的 br）压缩版本；
+    ETag 由内容哈希得到，每种编码各有一个强 ETag，客户端缓存命中时返回 304。
+    """
+
+    # 按优先顺序尝试的压缩编码
+    ENCODINGS = ("br", "gzip")
+
+    def __init__(self, data: Any, max_age: int = 0):
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8"
+        )
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.cache_control = f"public, max-age={max_age}"
+
+        # 编码 -> (响应体, ETag)
+        self.variants: Dict[str, Tuple[bytes, str]] = {
+            "identity": (body, f'"{digest}"'),
+            "gzip": (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gz"'),
+        }
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+        self._etags = {etag for _, etag in self.variants.values()}
+
+    def _choose_encoding(self, accept_encoding: str) -> str:
+        """按 Accept-Encoding 选择压缩编码（忽略 q=0 的编码）"""
+        accepted = set()
+        for item in accept_encoding.lower().split(","):
+            coding, _, params = item.strip().partition(";")
+            quality = params.strip().removeprefix("q=")
+            if params and quality.replace(".", "", 1).isdigit() and not float(quality):
+                continue
+            accepted.add(coding.strip())
+        for encoding in self.ENCODINGS:
+            if encoding in self.variants and (encoding in accepted or "*" in accepted):
+                return encoding
+        return "identity"
+
+    def respond(self, request: Request) -> Response:
+        encoding = self._choose_encoding(request.headers.get("accept-encoding", ""))
+        body, etag = self.variants[encoding]
+        headers = {
+            "ETag": etag,
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+
+        # 各编码版本内容相同，任一版本的 ETag 命中都视为未变化
+        if_none_match = request.headers.get("if-none-match", "")
+        if any(
+            tag.strip().removeprefix("W/") in self._etags
+            for tag in if_none_match.split(",")
+        ):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
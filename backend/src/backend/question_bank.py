@@ -0,0 +1,148 @@
+import asyncio
+import json
+import tomllib
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .commentary import load_team_titles
+from .config import CONFIG
+from .logger import logger
+from .prerender import PrerenderedJSON
+from .schema.quiz import QuizQuestion
+from .scoring import ScoringTable
+
+# 题库版本会写入 quiz_results.bank_version 列，不能超过列长度
+MAX_VERSION_LENGTH = 32
+
+
+class QuestionBank:
+    """编译好的只读题库
+
+    题库文件（JSON 或 TOML）包含 version、dimensions（维度 -> 特质列表）、
+    emojis（维度 -> Emoji）和 questions。加载时一次性构建所有派生结构：
+    计分表、预先序列化的公开题目列表以及团队称号表，之后不再修改；
+    热重载时整体替换为新的实例。
+    """
+
+    def __init__(
+        self,
+        version: str,
+        dimensions: Mapping[str, Sequence[str]],
+        emojis: Mapping[str, str],
+        questions: Sequence[Mapping[str, Any]],
+    ):
+        self.version = version
+        self.scoring = ScoringTable(questions, dimensions)
+        self.dimensions: Mapping[str, Tuple[str, ...]] = MappingProxyType(
+            {dimension: tuple(traits) for dimension, traits in dimensions.items()}
+        )
+        self.emojis: Mapping[str, str] = MappingProxyType(dict(emojis))
+        self.questions: Tuple[Mapping[str, Any], ...] = tuple(
+            MappingProxyType(dict(question)) for question in questions
+        )
+        # 公开的题目列表（不含 option_scores）
+        self.questions_payload = PrerenderedJSON(
+            [QuizQuestion(**question).model_dump() for question in questions],
+            max_age=CONFIG.QUIZ_QUESTIONS_MAX_AGE,
+        )
+        # 团队称号表，组合称号以排好序的维度对为键
+        self.single_titles, self.combination_titles = load_team_titles(
+            CONFIG.QUIZ_TEAM_TITLES_PATH, self.dimensions
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "QuestionBank":
+        """从 JSON / TOML 文件加载并编译题库，格式错误时抛出 ValueError"""
+        try:
+            if path.suffix == ".toml":
+                data = tomllib.loads(path.read_text(encoding="utf-8"))
+            else:
+                data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            raise ValueError(f"无法读取题库文件 {path}：{exc}") from exc
+
+        try:
+            version = str(data["version"])
+            dimensions = data["dimensions"]
+            questions = data["questions"]
+        except (KeyError, TypeError) as exc:
+            raise ValueError(f"题库文件 {path} 缺少字段：{exc}") from exc
+        if not version or len(version) > MAX_VERSION_LENGTH:
+            raise ValueError(
+                f"题库文件 {path} 的版本 {version!r} 必须是 1 到 "
+                f"{MAX_VERSION_LENGTH} 个字符"
+            )
+
+        ids = [question.get("id") for question in questions]
+        if len(set(ids)) != len(ids):
+            raise ValueError(f"题库文件 {path} 中存在重复的题目 ID")
+        for question in questions:
+            if len(question.get("option_scores", [])) != len(
+                question.get("options", [])
+            ):
+                raise ValueError(f"题目 {question.get('id')} 的选项与加分项数量不一致")
+
+        return cls(version, dimensions, data.get("emojis", {}), questions)
+
+
+class QuestionBankRegistry:
+    """当前生效的题库
+
+    请求开始时取一次 current，之后整个请求都使用这个实例；重载时先在后台完整
+    编译新题库，再一次性替换引用，正在处理的请求不受影响。
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.current: QuestionBank = QuestionBank.load(path)
+        self._mtime = self._stat()
+        self._listeners: List[Callable[[QuestionBank, QuestionBank], None]] = []
+        self._lock = asyncio.Lock()
+
+    def _stat(self) -> Optional[float]:
+        try:
+            return self.path.stat().st_mtime
+        except OSError:
+            return None
+
+    def add_listener(self, listener: Callable[[QuestionBank, QuestionBank], None]):
+        """注册题库替换后的回调 listener(旧题库, 新题库)"""
+        self._listeners.append(listener)
+
+    async def reload(self) -> Tuple[QuestionBank, QuestionBank]:
+        """重新加载题库文件并替换当前题库，返回 (旧题库, 新题库)"""
+        async with self._lock:
+            mtime = self._stat()
+            bank = await asyncio.to_thread(QuestionBank.load, self.path)
+            previous, self.current = self.current, bank
+            self._mtime = mtime
+        logger.info(f"题库已从版本 {previous.version} 切换到 {bank.version}")
+        for listener in self._listeners:
+            listener(previous, bank)
+        return previous, bank
+
+    async def watch(self, interval: float):
+        """定期检查题库文件的修改时间，变化时自动重载（每个进程各自执行）"""
+        while True:
+            await asyncio.sleep(interval)
+            if self._stat() == self._mtime:
+                continue
+            try:
+                await self.reload()
+            except ValueError as exc:
+                # 保留旧题库，等文件修正后再重试
+                self._mtime = self._stat()
+                logger.error(f"题库重载失败：{exc}")
+
+    def versions(self) -> Dict[str, Any]:
+        bank = self.current
+        return {
+            "version": bank.version,
+            "scoring_version": bank.scoring.version,
+            "question_count": len(bank.questions),
+            "path": str(self.path),
+        }
+
+
+question_banks = QuestionBankRegistry(CONFIG.QUIZ_BANK_PATH)
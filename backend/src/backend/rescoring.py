@@ -0,0 +1,254 @@
+"""批量重新计分 - 题库加分规则变化后，按新题库刷新已保存的答题结果
+
+1. 按自增 ID 分块读取 scoring_version / bank_version 与目标题库不一致的行
+   （只读 id 和答案两列），内存占用只与块大小和并行块数有关，与总行数无关；
+2. 每块在进程池中批量计分（总分相同的答案只还原一次结果），并按当前存储模式
+   （QUIZ_COMPACT_STORAGE / QUIZ_LAZY_SCORING）编码成要写回的列，JSON 列的
+   解析与序列化也在计分进程中完成；
+3. 主进程用一条按主键的 executemany UPDATE 写回一块并立即提交，读取下一块与
+   计分并行进行。中断后重新运行会从尚未刷新的行继续。
+
+正在运行的服务进程中已缓存的答题结果和最佳室友索引不会自动刷新，
+重新计分完成后需重启服务。
+
+命令行用法见 backend.cli 的 rescore 子命令。
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from sqlalchemy import (
+    String,
+    bindparam,
+    cast,
+    func,
+    or_,
+    select,
+    true,
+    type_coerce,
+    update,
+)
+
+from .config import CONFIG
+from .database import async_session, engine
+from .model.quiz import QuizResult, encode_quiz_row, unpack_answers
+from .question_bank import QuestionBank
+
+# 每次写回都包含的列，保证 executemany 的每组参数结构相同
+RESCORE_COLUMNS = (
+    "answers",
+    "answers_packed",
+    "trait_scores",
+    "trait_scores_packed",
+    "primary_traits",
+    "radar_data",
+    "scoring_version",
+    "bank_version",
+)
+# JSON 列在计分进程中编解码，主进程只传递文本
+JSON_COLUMNS = ("answers", "trait_scores", "primary_traits", "radar_data")
+
+AnswerRow = Tuple[
+    int, Optional[str], Optional[bytes]
+]  # (id, answers 文本, answers_packed)
+
+
+class RescoreReport(NamedTuple):
+    """重新计分结果：rows 为写回的行数，seconds 为总耗时"""
+
+    rows: int
+    seconds: float
+    bank_version: str
+    scoring_version: str
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+def rescore_rows(bank: QuestionBank, rows: Sequence[AnswerRow]) -> List[Dict[str, Any]]:
+    """为一块 (id, answers 文本, answers_packed) 计算写回的列
+
+    返回 UPDATE_STATEMENT 的参数，JSON 列已序列化为文本。
+    """
+    answers_list = []
+    for _, answers_text, answers_packed in rows:
+        answers = json.loads(answers_text) if answers_text else None
+        if answers is None:
+            answers = unpack_answers(answers_packed or b"")
+        answers_list.append(answers)
+
+    if CONFIG.QUIZ_LAZY_SCORING:
+        # 延迟计分只保存答案，派生字段读取时再计算
+        analyses = [(None, None, None)] * len(rows)
+    else:
+        analyses = bank.scoring.analyze_many(answers_list)
+
+    params = []
+    for (row_id, _, _), answers, (trait_scores, primary_traits, radar_data) in zip(
+        rows, answers_list, analyses
+    ):
+        row = encode_quiz_row(
+            {
+                **dict.fromkeys(RESCORE_COLUMNS),
+                "answers": answers,
+                "trait_scores": trait_scores,
+                "primary_traits": primary_traits,
+                "radar_data": radar_data,
+            },
+            bank,
+        )
+        for column in JSON_COLUMNS:
+            # 与 JSON 类型写入 None 时一致存 'null'，已有数据库中这些列是 NOT NULL
+            row[column] = json.dumps(row[column])
+        params.append(
+            {"row_id": row_id, **{f"new_{key}": row[key] for key in RESCORE_COLUMNS}}
+        )
+    return params
+
+
+def _update_statement(dialect_name: str):
+    """按主键批量写回的 UPDATE（JSON 列按文本绑定，跳过主进程中的序列化）
+
+    SQLite 的 JSON 列本身以文本存储，直接写入；PostgreSQL 不会把 VARCHAR 参数
+    隐式转换为 json，需要显式 CAST。
+    """
+    table = QuizResult.__table__
+    values = {}
+    for column in RESCORE_COLUMNS:
+        param = bindparam(f"new_{column}")
+        if column in JSON_COLUMNS:
+            param = type_coerce(param, String)
+            if dialect_name == "postgresql":
+                param = cast(param, table.c[column].type)
+        values[column] = param
+    return update(table).where(table.c.id == bindparam("row_id")).values(values)
+
+
+UPDATE_STATEMENT = _update_statement(engine.dialect.name)
+
+
+# 进程池中每个 worker 各自加载一次的题库
+_worker_bank: Optional[QuestionBank] = None
+
+
+def _init_worker(path: Path, scoring_version: str):
+    global _worker_bank
+    bank = QuestionBank.load(path)
+    if bank.scoring.version != scoring_version:
+        raise RuntimeError(f"题库文件 {path} 在重新计分过程中被修改")
+    _worker_bank = bank
+
+
+def _rescore_in_worker(rows: Sequence[AnswerRow]) -> List[Dict[str, Any]]:
+    return rescore_rows(_worker_bank, rows)
+
+
+async def rescore_quiz_results(
+    bank_path: Path,
+    chunk_size: int = 5000,
+    workers: int = 1,
+    rescore_all: bool = False,
+    progress: Optional[Callable[[int, int, float], None]] = None,
+) -> RescoreReport:
+    """按 bank_path 指定的题库重新计算 quiz_results 中的派生字段
+
+    默认只处理计分版本或题库版本与目标题库不一致的行，rescore_all=True 时处理
+    全部行（例如切换了存储模式之后）。progress(已处理行数, 总行数, 已用秒数)
+    在每块写回后调用。
+    """
+    bank = QuestionBank.load(bank_path)
+    condition = true()
+    if not rescore_all:
+        condition = or_(
+            QuizResult.scoring_version.is_(None),
+            QuizResult.bank_version.is_(None),
+            QuizResult.scoring_version != bank.scoring.version,
+            QuizResult.bank_version != bank.version,
+        )
+
+    workers = max(1, workers)
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(bank_path, bank.scoring.version),
+        )
+    loop = asyncio.get_running_loop()
+    pending: Deque[asyncio.Future] = deque()
+    started = time.monotonic()
+    done = 0
+
+    async with async_session() as db:
+        total = (
+            await db.execute(
+                select(func.count()).select_from(QuizResult).where(condition)
+            )
+        ).scalar_one()
+
+        async def write_back(future: asyncio.Future):
+            nonlocal done
+            params = await future
+            await db.execute(UPDATE_STATEMENT, params)
+            await db.commit()
+            done += len(params)
+            if progress:
+                progress(done, total, time.monotonic() - started)
+
+        try:
+            last_id = 0
+            while True:
+                rows = (
+                    await db.execute(
+                        select(
+                            QuizResult.id,
+                            type_coerce(QuizResult.answers, String),
+                            QuizResult.answers_packed,
+                        )
+                        .where(condition, QuizResult.id > last_id)
+                        .order_by(QuizResult.id)
+                        .limit(chunk_size)
+                    )
+                ).all()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                rows = [tuple(row) for row in rows]
+
+                if pool is None:
+                    future = loop.create_future()
+                    future.set_result(rescore_rows(bank, rows))
+                else:
+                    future = loop.run_in_executor(pool, _rescore_in_worker, rows)
+                pending.append(future)
+                # 每个 worker 最多排队两块，限制内存占用
+                if len(pending) >= workers * 2:
+                    await write_back(pending.popleft())
+
+            while pending:
+                await write_back(pending.popleft())
+        finally:
+            for future in pending:
+                future.cancel()
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    return RescoreReport(
+        done, time.monotonic() - started, bank.version, bank.scoring.version
+    )
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, List, Any
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from ..model.quiz import QuizResult
 from ..database import async_session
+from ..matching import TeamMatrix, shared_trait_ratio
+from .quiz import TEAM_MAX_MEMBERS, TEAM_MIN_MEMBERS, fetch_quiz_results
 from ..schema.certificate import GroupCompatibilityRequest, GroupCompatibilityResponse
 
 router = APIRouter(prefix="/certificate", tags=["证书模块"])
@@ -65,36 +65,30 @@ def calculate_group_compatibility(traits_list: List[Dict[str, str]]) -> Dict[str
 
 
 def find_best_pairs(traits_list: List[Dict[str, str]], codes: List[str]) -> List[Dict[str, Any]]:
-    """找出最佳配对"""
+    """找出最佳配对（共同特质占比最高的前3对）"""
     if len(traits_list) < 2:
         return []
-    
+
+    # 共同特质占比只取决于两人的特质位集，按位集去重后一次算出两两得分矩阵
+    team = TeamMatrix(traits_list, shared_trait_ratio)
+
+    # 部分排序，只取前3对，再为这几对整理共同维度
     pairs = []
-    # 简单实现：找出具有最多共同特质的配对
-    for i in range(len(traits_list)):
-        for j in range(i + 1, len(traits_list)):
-            traits1 = traits_list[i]
-            traits2 = traits_list[j]
-            
-            common_traits = 0
-            common_dimensions = []
-            
-            for dimension in traits1:
-                if dimension in traits2 and traits1[dimension] == traits2[dimension]:
-                    common_traits += 1
-                    common_dimensions.append(dimension)
-            
-            pairs.append({
-                "member1_code": codes[i],
-                "member2_code": codes[j],
-                "common_traits_count": common_traits,
-                "common_dimensions": common_dimensions,
-                "compatibility_score": int((common_traits / max(len(traits1), len(traits2))) * 100) if traits1 and traits2 else 0
-            })
-    
-    # 按兼容性得分排序，返回前几个最佳配对
-    pairs.sort(key=lambda x: x["compatibility_score"], reverse=True)
-    return pairs[:3]  # 返回前3个最佳配对
+    for i, j in team.top_pairs(3):
+        traits1, traits2 = team.traits[i], team.traits[j]
+        common_dimensions = [
+            dimension
+            for dimension in traits1
+            if dimension in traits2 and traits1[dimension] == traits2[dimension]
+        ]
+        pairs.append({
+            "member1_code": codes[i],
+            "member2_code": codes[j],
+            "common_traits_count": len(common_dimensions),
+            "common_dimensions": common_dimensions,
+            "compatibility_score": team.compatibility[i][j],
+        })
+    return pairs
 
 
 @router.post("/group-compatibility", response_model=GroupCompatibilityResponse)
@@ -103,20 +97,19 @@ async def calculate_group_compatibility_endpoint(
     db: AsyncSession = Depends(get_db)
 ):
     """计算寝室群体兼容性
-    接收四个舍友代码，查询数据库中的答题数据，并计算群体特质近似度
+    接收 2-64 个舍友代码，查询数据库中的答题数据，并计算群体特质近似度
     """
     codes = request.codes
-    if len(codes) != 4:
-        raise HTTPException(status_code=400, detail="需要提供 exactly 4 个舍友代码")
+    if not TEAM_MIN_MEMBERS <= len(codes) <= TEAM_MAX_MEMBERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"需要提供 {TEAM_MIN_MEMBERS}-{TEAM_MAX_MEMBERS} 个舍友代码",
+        )
     
-    # 查询数据库获取所有成员的答题数据
-    members_data = []
-    for code in codes:
-        result = await db.execute(select(QuizResult).where(QuizResult.code == code))
-        member = result.scalar_one_or_none()
-        if not member:
-            raise HTTPException(status_code=404, detail=f"未找到代码为 {code} 的成员数据")
-        members_data.append(member)
+    # 一次查询获取所有成员的答题数据
+    members_data = await fetch_quiz_results(
+        db, codes, missing_detail="未找到代码为 {code} 的成员数据"
+    )
     
     # 提取所有成员的主要特质
     traits_list = [member.primary_traits for member in members_data]
@@ -1,6 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from typing import List, Optional
-from ..model.wordcloud import wordcloud_storage, PRESET_WORDS
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.responses import StreamingResponse
+from ..config import CONFIG
+from ..database import async_session
+from ..model.wordcloud import wordcloud_broadcaster, wordcloud_storage, PRESET_WORDS
 from ..schema.wordcloud import WordCloudEntry
 
 
@@ -8,31 +12,81 @@ from ..schema.wordcloud import WordCloudEntry
 router = APIRouter(prefix="/wordcloud", tags=["wordcloud"])
 
 
+# 数据库会话依赖
+async def get_db():
+    async with async_session() as session:
+        yield session
+
+
 @router.post("/save", response_model=dict)
-def save_wordcloud_entry(entry: WordCloudEntry):
+async def save_wordcloud_entry(
+    entry: WordCloudEntry, db: AsyncSession = Depends(get_db)
+):
     """保存用户的词云选择 - 只更新词频统计"""
     try:
-        result = wordcloud_storage.add_entry(entry)
-        return {"message": "词频统计已更新"}
+        counted = await wordcloud_storage.add_entry(db, entry)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"保存失败: {str(e)}")
+    if counted == 0:
+        raise HTTPException(status_code=409, detail="这些词已经选择过了")
+    return {"message": "词频统计已更新"}
 
 
 @router.get("/global", response_model=List[dict])
-def get_global_wordcloud():
-    """获取全局词云数据（基于所有用户的选择）"""
+async def get_global_wordcloud(
+    request: Request,
+    top: Optional[int] = Query(None, ge=1, description="只返回词频最高的前 N 个词"),
+    window: Optional[int] = Query(
+        None,
+        ge=1,
+        le=CONFIG.WORDCLOUD_TREND_HOURS * 60,
+        description="只统计最近 N 分钟内的选择（趋势），不传则为全部历史",
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    """获取全局词云数据（基于所有用户的选择），按词频降序排列
+
+    响应体在词频变化时才重新序列化，并带有 ETag；客户端携带 If-None-Match
+    且内容未变化时返回 304。
+    """
     try:
-        word_frequencies = wordcloud_storage.get_all_word_frequencies()
-        # 如果还没有数据，返回预设词汇作为示例
-        if not word_frequencies:
-            return [
-                {"text": word, "value": 10 + i % 20}
-                for i, word in enumerate(PRESET_WORDS[:20])
-            ]
-        return word_frequencies
+        if window is not None:
+            body, etag = await wordcloud_storage.get_trending_payload(db, window, top)
+        else:
+            body, etag = await wordcloud_storage.get_global_payload(db, top)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取失败: {str(e)}")
 
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/stream")
+async def stream_wordcloud():
+    """以 Server-Sent Events 推送词频变化
+
+    每个 tick 推送一帧 `delta` 事件，data 为 [{"text": 词, "delta": 增量}]；
+    客户端应先拉取 /wordcloud/global 作为初始状态，收到 `reset` 事件时重新拉取。
+    """
+    return StreamingResponse(
+        wordcloud_broadcaster.subscribe(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/dedup-stats", response_model=dict)
+def get_dedup_stats():
+    """获取 session 去重过滤器的误判率估算与内存占用"""
+    if wordcloud_storage.dedup_filter is None:
+        return {"enabled": False}
+    return {"enabled": True, **wordcloud_storage.dedup_filter.stats()}
+
 
 @router.get("/words", response_model=List[str])
 def get_preset_words():
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
@@ -20,6 +20,12 @@ class QuizSubmission(BaseModel):
     submitted_at: Optional[datetime] = None
 
 
+class QuizBatchSubmission(BaseModel):
+    """批量答题提交模型（离线答题点同步使用）"""
+
+    submissions: List[QuizSubmission] = Field(..., min_length=1, max_length=10000)
+
+
 class TraitAnalysis(BaseModel):
     """特质分析模型"""
 
@@ -48,6 +54,15 @@ class TeamMatchRequest(BaseModel):
     codes: List[str]  # 四个参与者的代码列表
 
 
+class DormGroupingRequest(BaseModel):
+    """分寝请求模型"""
+
+    codes: List[str] = Field(..., min_length=2, max_length=5000)
+    room_size: int = Field(4, ge=2, le=8)  # 每间寝室人数
+    time_budget: float = Field(2.0, gt=0, le=30)  # 求解时间（秒）
+    restarts: int = Field(4, ge=1, le=32)  # 随机重启次数
+
+
 class TeamMatchResult(BaseModel):
     """团队匹配结果模型"""
 
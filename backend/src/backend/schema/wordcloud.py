@@ -8,6 +8,7 @@ class WordCloudEntry(BaseModel):
 
     words: List[str] = Field(..., min_items=1, max_items=10)
     theme: Optional[dict] = Field(default_factory=dict)
+    # 兼容旧客户端保留，服务端不使用（趋势按服务器接收时间分桶）
     created_at: datetime = Field(default_factory=datetime.now)
     session_id: Optional[str] = None
 
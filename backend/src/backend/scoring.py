@@ -0,0 +1,236 @@
+import hashlib
+import json
+import struct
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+# 紧凑存储中单个特质分数的取值范围（int16）
+PACKED_SCORE_MIN = -(2**15)
+PACKED_SCORE_MAX = 2**15 - 1
+
+# 单个维度的还原结果：(特质分数, 主要特质, 平均分, 雷达图得分)
+DimensionResult = Tuple[Dict[str, int], Optional[str], float, int]
+
+
+class ScoringTable:
+    """题库计分表 - 导入时把题库编译一次，之后只读
+
+    所有特质按维度顺序展开成一维下标，每个 (题目ID, 选项下标) 预先编译成
+    ((特质下标, 分值), ...)，每个维度的雷达图满分也在编译时算好缓存。
+    """
+
+    def __init__(
+        self,
+        questions: Sequence[Mapping[str, Any]],
+        dimensions: Mapping[str, Sequence[str]],
+    ):
+        # 计分版本：由题库选项加分与维度定义的内容哈希得到，题库变化时随之变化
+        self.version: str = hashlib.sha1(
+            json.dumps(
+                [
+                    dimensions,
+                    [[q["id"], q.get("option_scores", [])] for q in questions],
+                ],
+                ensure_ascii=False,
+                sort_keys=True,
+            ).encode()
+        ).hexdigest()[:12]
+
+        self.dimensions: List[str] = list(dimensions.keys())
+        self.dimension_traits: Dict[str, List[str]] = {
+            dimension: list(dict.fromkeys(traits))
+            for dimension, traits in dimensions.items()
+        }
+
+        # 展开特质：(维度, 特质) -> 一维下标，每个维度占据连续的一段
+        trait_index: Dict[Tuple[str, str], int] = {}
+        self.dimension_slices: List[Tuple[int, int]] = []
+        for dimension in self.dimensions:
+            start = len(trait_index)
+            for trait in self.dimension_traits[dimension]:
+                trait_index[(dimension, trait)] = len(trait_index)
+            self.dimension_slices.append((start, len(trait_index)))
+        self.trait_index = trait_index
+        self.trait_count = len(trait_index)
+        self._packed_scores = struct.Struct(f"<{self.trait_count}h")
+
+        # 问题ID -> 每个选项编译后的 ((特质下标, 分值), ...)
+        self.option_weights: Dict[int, Tuple[Tuple[Tuple[int, int], ...], ...]] = {}
+        for question in questions:
+            compiled_options = []
+            for score_map in question.get("option_scores", []):
+                weights: Dict[int, int] = {}
+                for dimension, trait_map in score_map.items():
+                    for trait, points in trait_map.items():
+                        index = trait_index.get((dimension, trait))
+                        if index is None:
+                            # 忽略未注册的维度或特质
+                            continue
+                        try:
+                            weights[index] = weights.get(index, 0) + int(points)
+                        except Exception:
+                            # 忽略非整数分值
+                            continue
+                compiled_options.append(tuple(weights.items()))
+            self.option_weights[question["id"]] = tuple(compiled_options)
+
+        # 每个维度可能的最大总分（各题在该维度上所有选项的最大加分之和）
+        self.max_possible_by_dimension: Dict[str, int] = {
+            dimension: 0 for dimension in self.dimensions
+        }
+        for question in questions:
+            per_question_max: Dict[str, int] = {}
+            for score_map in question.get("option_scores", []):
+                for dimension, trait_map in score_map.items():
+                    per_question_max[dimension] = max(
+                        per_question_max.get(dimension, 0),
+                        sum(
+                            int(v)
+                            for v in trait_map.values()
+                            if isinstance(v, (int, float))
+                        ),
+                    )
+            for dimension, value in per_question_max.items():
+                if dimension in self.max_possible_by_dimension:
+                    self.max_possible_by_dimension[dimension] += value
+
+    def accumulate(self, answers: Mapping[Any, Any]) -> List[int]:
+        """把一份答案累加成按特质下标排列的分数数组"""
+        totals = [0] * self.trait_count
+        option_weights = self.option_weights
+        for question_id, answer_index in answers.items():
+            try:
+                qid = int(question_id)
+                idx = int(answer_index)
+            except Exception:
+                continue
+
+            options = option_weights.get(qid)
+            if not options or idx < 0 or idx >= len(options):
+                continue
+
+            for trait_idx, points in options[idx]:
+                totals[trait_idx] += points
+        return totals
+
+    def normalize(self, dimension: str, total_score: float) -> int:
+        """把维度总分按该维度可能的最高分标准化到0-100"""
+        max_possible = self.max_possible_by_dimension.get(dimension, 0)
+        if max_possible > 0:
+            return int(min(100, (total_score / max_possible) * 100))
+        return 0
+
+    def analyze(
+        self, answers: Mapping[Any, Any]
+    ) -> Tuple[Dict[str, Dict[str, int]], Dict[str, str], Dict[str, Any]]:
+        """计算 (trait_scores, 前两个维度的主要特质, radar_data)"""
+        return self.analyze_totals(self.accumulate(answers))
+
+    def analyze_many(
+        self, answers_list: Sequence[Mapping[Any, Any]]
+    ) -> List[Tuple[Dict[str, Dict[str, int]], Dict[str, str], Dict[str, Any]]]:
+        """批量计分：逐份累加特质分数数组，再按维度还原结果
+
+        单个维度上的分数组合远少于所有维度的总分组合，同一批答案中每个维度的
+        每种分数切片只还原一次（结果中的维度字典在批内共享，调用方不应修改）。
+        """
+        dimension_memo: Dict[Tuple[int, Tuple[int, ...]], DimensionResult] = {}
+        return [
+            self.analyze_totals(self.accumulate(answers), dimension_memo)
+            for answers in answers_list
+        ]
+
+    def _analyze_dimension(
+        self, position: int, values: Tuple[int, ...]
+    ) -> DimensionResult:
+        """还原单个维度：(特质分数, 主要特质, 平均分, 雷达图得分)"""
+        dimension = self.dimensions[position]
+        traits = self.dimension_traits[dimension]
+        total_score = sum(values)
+        if values:
+            # 同分时取靠前的特质，与 max() 的行为一致
+            primary_trait = traits[values.index(max(values))]
+            average = total_score / len(values)
+        else:
+            primary_trait, average = None, 0
+        return (
+            dict(zip(traits, values)),
+            primary_trait,
+            average,
+            self.normalize(dimension, total_score),
+        )
+
+    def analyze_totals(
+        self,
+        totals: Sequence[int],
+        dimension_memo: Optional[
+            Dict[Tuple[int, Tuple[int, ...]], DimensionResult]
+        ] = None,
+    ) -> Tuple[Dict[str, Dict[str, int]], Dict[str, str], Dict[str, Any]]:
+        """由特质分数数组还原出接口使用的 trait_scores / primary_traits / radar_data
+
+        传入 dimension_memo 时按 (维度, 分数切片) 复用已还原的维度结果。
+        """
+        trait_scores: Dict[str, Dict[str, int]] = {}
+        primary_traits: Dict[str, str] = {}
+        dimension_scores: List[Tuple[str, float]] = []
+        radar_scores: List[int] = []
+
+        for position, (start, end) in enumerate(self.dimension_slices):
+            values = tuple(totals[start:end])
+            if dimension_memo is None:
+                result = self._analyze_dimension(position, values)
+            else:
+                result = dimension_memo.get((position, values))
+                if result is None:
+                    result = dimension_memo[(position, values)] = (
+                        self._analyze_dimension(position, values)
+                    )
+            scores, primary_trait, average, radar_score = result
+
+            dimension = self.dimensions[position]
+            trait_scores[dimension] = scores
+            if primary_trait is not None:
+                primary_traits[dimension] = primary_trait
+            dimension_scores.append((dimension, average))
+            radar_scores.append(radar_score)
+
+        # 找出分数最高的两个特质维度（按维度平均分）
+        top_dimensions = sorted(dimension_scores, key=lambda x: x[1], reverse=True)[:2]
+        top_primary_traits = {
+            dim: primary_traits[dim]
+            for dim, _ in top_dimensions
+            if dim in primary_traits
+        }
+
+        radar_data = {
+            "dimensions": list(self.dimensions),
+            "scores": radar_scores,
+            "max_score": 100,
+        }
+        return trait_scores, top_primary_traits, radar_data
+
+    def pack_trait_scores(
+        self, trait_scores: Mapping[str, Mapping[str, int]]
+    ) -> Optional[bytes]:
+        """把 trait_scores 按特质下标顺序打包成 int16 小端数组
+
+        结构与本题库不一致或分数越界时返回 None，由调用方退回 JSON 存储。
+        """
+        totals = []
+        for dimension in self.dimensions:
+            scores = trait_scores.get(dimension)
+            traits = self.dimension_traits[dimension]
+            if scores is None or list(scores) != traits:
+                return None
+            for trait in traits:
+                value = scores[trait]
+                if not PACKED_SCORE_MIN <= value <= PACKED_SCORE_MAX:
+                    return None
+                totals.append(value)
+        if len(trait_scores) != len(self.dimensions):
+            return None
+        return self._packed_scores.pack(*totals)
+
+    def unpack_totals(self, data: bytes) -> Tuple[int, ...]:
+        """把紧凑存储的特质分数还原为按特质下标排列的数组"""
+        return self._packed_scores.unpack(data)
@@ -0,0 +1,108 @@
+"""测试环境：临时目录中的独立 SQLite 数据库
+
+配置在导入 backend 之前通过环境变量设置，每个使用 database 夹具的测试
+都从空表开始。
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import pytest
+
+WORKDIR = Path(tempfile.mkdtemp(prefix="backend-tests-"))
+(WORKDIR / "static").mkdir()
+os.chdir(WORKDIR)
+os.environ.update(
+    DATABASE_URI=f"sqlite+aiosqlite:///{WORKDIR / 'test.db'}",
+    LOG_LEVEL="WARNING",
+    LOG_PATH=str(WORKDIR / "logs"),
+    QUIZ_BANK_WATCH_INTERVAL="0",
+    QUIZ_GROUPING_WORKERS="1",
+    # 锁等待出问题时尽快失败，而不是挂起测试
+    SQLITE_BUSY_TIMEOUT="1000",
+)
+
+from backend import app  # noqa: E402
+from backend.database import Base, async_session, engine, init_db  # noqa: E402
+from backend.model.quiz import QuizCodeAllocator, profile_cache  # noqa: E402
+from backend.model.quiz_index import match_index  # noqa: E402
+from backend.model.quiz_stats import quiz_stats  # noqa: E402
+from backend.router import quiz  # noqa: E402
+
+
+async def _run_and_dispose(coro):
+    try:
+        return await coro
+    finally:
+        # 每个测试各自一个事件循环，连接不跨循环复用
+        await engine.dispose()
+
+
+@pytest.fixture
+def run():
+    """在新的事件循环中执行协程并返回结果"""
+    return lambda coro: asyncio.run(_run_and_dispose(coro))
+
+
+@pytest.fixture
+def database(run, monkeypatch):
+    """清空数据库（与应用启动时一样建好统计行）并重置依赖数据库内容的进程内状态"""
+
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await init_db()
+        async with async_session() as db:
+            await quiz_stats.ensure_built(db)
+
+    run(reset())
+    monkeypatch.setattr(quiz, "code_allocator", QuizCodeAllocator(4))
+    profile_cache.invalidate()
+    match_index.clear()
+    yield
+    profile_cache.invalidate()
+    match_index.clear()
+
+
+@pytest.fixture
+def make_rows():
+    """按当前题库为一组答案生成 insert_quiz_results 需要的行"""
+
+    def build(answers_list, name_prefix="p"):
+        bank = quiz.question_banks.current
+        now = datetime.now()
+        rows = []
+        for i, answers in enumerate(answers_list):
+            trait_scores, primary_traits, radar_data = bank.scoring.analyze(answers)
+            rows.append(
+                {
+                    "participant_name": f"{name_prefix}{i}",
+                    "answers": answers,
+                    "trait_scores": trait_scores,
+                    "primary_traits": primary_traits,
+                    "radar_data": radar_data,
+                    "submitted_at": now,
+                }
+            )
+        return rows
+
+    return build
+
+
+def random_answers(rng, count=1):
+    """按当前题库随机作答"""
+    questions = quiz.question_banks.current.questions
+    return [
+        {str(q["id"]): str(rng.randrange(len(q["options"]))) for q in questions}
+        for _ in range(count)
+    ]
+
+
+def api_client() -> httpx.AsyncClient:
+    """直接调用 ASGI 应用的 HTTP 客户端（不经过 lifespan）"""
+    transport = httpx.ASGITransport(app=app)
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
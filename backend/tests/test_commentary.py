@@ -0,0 +1,51 @@
+import itertools
+import json
+
+import pytest
+
+from backend.commentary import load_team_titles
+from backend.config import CONFIG
+from backend.question_bank import QuestionBank
+
+
+def test_shipped_titles_cover_every_dimension():
+    bank = QuestionBank.load(CONFIG.QUIZ_BANK_PATH)
+    assert set(bank.single_titles) == set(bank.dimensions)
+    assert set(bank.combination_titles) == {
+        tuple(sorted(pair)) for pair in itertools.combinations(bank.dimensions, 2)
+    }
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        None,
+        "not json",
+        json.dumps({"single": {}}),
+        json.dumps(
+            {
+                "single": {"未知维度": {"title": "t", "commentary": "c"}},
+                "combination": [],
+            }
+        ),
+        json.dumps(
+            {
+                "single": {},
+                "combination": [{"dimensions": ["A"], "title": "t", "commentary": "c"}],
+            }
+        ),
+    ],
+)
+def test_invalid_titles_file_fails(tmp_path, content):
+    path = tmp_path / "team_titles.json"
+    if content is not None:
+        path.write_text(content, encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_team_titles(path, ["A", "B"])
+
+
+def test_question_bank_fails_without_titles(tmp_path, monkeypatch):
+    """称号文件缺失时题库加载失败，而不是静默退回通用称号"""
+    monkeypatch.setattr(CONFIG, "QUIZ_TEAM_TITLES_PATH", tmp_path / "missing.json")
+    with pytest.raises(ValueError):
+        QuestionBank.load(CONFIG.QUIZ_BANK_PATH)
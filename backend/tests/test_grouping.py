@@ -0,0 +1,98 @@
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from backend.database import async_session
+from backend.grouping import (
+    GroupingPool,
+    _room_score,
+    build_score_matrix,
+    room_sizes,
+    solve_rooms,
+)
+from backend.router import quiz
+
+from .conftest import api_client, random_answers
+
+
+def random_primary_traits(rng, count):
+    return [quiz.analyze_traits(answers)[1] for answers in random_answers(rng, count)]
+
+
+def check_assignment(assignment, groups, scores, student_count, room_size):
+    members = sorted(student for room in assignment.rooms for student in room)
+    assert members == list(range(student_count))
+    assert sorted(map(len, assignment.rooms), reverse=True) == room_sizes(
+        student_count, room_size
+    )
+    for room, score in zip(assignment.rooms, assignment.scores):
+        assert score == pytest.approx(_room_score(room, groups, scores))
+    assert assignment.total_score == pytest.approx(sum(assignment.scores))
+
+
+@pytest.mark.parametrize("student_count, room_size", [(30, 4), (9, 4), (3, 6)])
+def test_rooms_partition_students(student_count, room_size):
+    rng = random.Random(student_count)
+    traits_list = random_primary_traits(rng, student_count)
+    groups, scores = build_score_matrix(traits_list, quiz.calculate_trait_compatibility)
+    assignment = solve_rooms(groups, scores, room_size, time_budget=0.2, restarts=2)
+    check_assignment(assignment, groups, scores, student_count, room_size)
+
+    # 不差于按原顺序依次住满
+    in_order = [
+        list(range(start, min(start + room_size, student_count)))
+        for start in range(0, student_count, room_size)
+    ]
+    baseline = sum(_room_score(room, groups, scores) for room in in_order)
+    assert assignment.total_score >= baseline - 1e-9
+
+
+def test_rooms_with_shared_executor():
+    traits_list = random_primary_traits(random.Random(31), 40)
+    groups, scores = build_score_matrix(traits_list, quiz.calculate_trait_compatibility)
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assignment = solve_rooms(
+            groups, scores, 4, time_budget=0.2, restarts=4, workers=2, executor=executor
+        )
+    check_assignment(assignment, groups, scores, 40, 4)
+    assert assignment.restarts == 4
+
+
+def test_grouping_pool_threshold():
+    pool = GroupingPool()
+    pool.start(1)
+    assert pool.executor is None
+
+    pool.start(2)
+    try:
+        assert pool.workers == 2
+        assert pool.for_students(199, 200) is None
+        assert pool.for_students(200, 200) is pool.executor
+    finally:
+        pool.shutdown()
+    assert pool.executor is None
+    assert pool.for_students(500, 200) is None
+
+
+def test_dorm_grouping_endpoint(database, run, make_rows):
+    bank = quiz.question_banks.current
+    rows = make_rows(random_answers(random.Random(32), 10))
+
+    async def scenario():
+        async with async_session() as db:
+            codes = await quiz.insert_quiz_results(db, rows, bank)
+        async with api_client() as client:
+            response = await client.post(
+                "/api/quiz/dorm-grouping",
+                json={"codes": codes, "room_size": 4, "time_budget": 0.2},
+            )
+        return codes, response
+
+    codes, response = run(scenario())
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["room_count"] == 3
+    assert sorted(
+        member["code"] for room in payload["rooms"] for member in room["members"]
+    ) == sorted(codes)
@@ -0,0 +1,155 @@
+import random
+
+from sqlalchemy import insert
+
+from backend.config import CONFIG
+from backend.database import async_session
+from backend.matching import TeamMatrix, TraitEncoder, pair_compatibility
+from backend.model.quiz import QuizResult, encode_quiz_row
+from backend.model.quiz_index import TraitMatchIndex, match_index
+from backend.router import quiz
+from backend.router.certificate import find_best_pairs
+
+from .conftest import random_answers
+
+
+def random_traits(rng):
+    """随机取部分维度的主要特质（模拟旧数据或题库变化后的缺失维度）"""
+    dimension_traits = quiz.question_banks.current.scoring.dimension_traits
+    return {
+        dimension: rng.choice(traits)
+        for dimension, traits in dimension_traits.items()
+        if rng.random() < 0.8
+    }
+
+
+def brute_force_matches(profiles, code):
+    """逐人调用 calculate_trait_compatibility，去掉没有共同维度的人"""
+    traits = profiles[code]
+    return sorted(
+        (
+            quiz.calculate_trait_compatibility(traits, other_traits)
+            for other, other_traits in profiles.items()
+            if other != code and traits.keys() & other_traits.keys()
+        ),
+        reverse=True,
+    )
+
+
+def test_pair_compatibility_matches_brute_force():
+    rng = random.Random(21)
+    encoder = TraitEncoder()
+    for _ in range(500):
+        traits1, traits2 = random_traits(rng), random_traits(rng)
+        assert pair_compatibility(
+            encoder.encode(traits1), encoder.encode(traits2)
+        ) == quiz.calculate_trait_compatibility(traits1, traits2)
+
+
+def test_match_index_matches_brute_force():
+    rng = random.Random(22)
+    profiles = {f"C{i:03d}": random_traits(rng) for i in range(300)}
+    index = TraitMatchIndex()
+    for code, traits in profiles.items():
+        index.add(code, None, traits)
+
+    for code in rng.sample(sorted(profiles), 20):
+        expected = brute_force_matches(profiles, code)
+        for limit in (1, 10, len(profiles)):
+            matches = index.top_matches(code, limit)
+            assert [m.compatibility_score for m in matches] == expected[:limit]
+            for match in matches:
+                assert match.code != code
+                assert match.primary_traits == profiles[match.code]
+                assert match.compatibility_score == quiz.calculate_trait_compatibility(
+                    profiles[code], profiles[match.code]
+                )
+
+
+def brute_force_best_pairs(traits_list, count=3):
+    """逐对计算共同特质占比，同分时保持成员顺序"""
+    scored = []
+    for i, traits1 in enumerate(traits_list):
+        for j in range(i + 1, len(traits_list)):
+            traits2 = traits_list[j]
+            score = 0
+            if traits1 and traits2:
+                common = sum(traits2.get(d) == t for d, t in traits1.items())
+                score = int(common / max(len(traits1), len(traits2)) * 100)
+            scored.append((score, i, j))
+    scored.sort(key=lambda item: -item[0])
+    return scored[:count]
+
+
+def test_team_matrix_matches_brute_force():
+    rng = random.Random(23)
+    traits_list = [random_traits(rng) for _ in range(40)]
+    team = TeamMatrix(traits_list)
+    for i, j in team.pairs():
+        assert team.compatibility[i][j] == quiz.calculate_trait_compatibility(
+            traits_list[i], traits_list[j]
+        )
+
+
+def test_certificate_best_pairs_match_brute_force():
+    rng = random.Random(24)
+    for size in (2, 5, 30):
+        traits_list = [random_traits(rng) for _ in range(size)]
+        codes = [f"C{i:03d}" for i in range(size)]
+        pairs = find_best_pairs(traits_list, codes)
+        assert [
+            (pair["compatibility_score"], pair["member1_code"], pair["member2_code"])
+            for pair in pairs
+        ] == [
+            (score, codes[i], codes[j])
+            for score, i, j in brute_force_best_pairs(traits_list)
+        ]
+
+
+def test_match_index_waits_for_out_of_order_ids(database, run, make_rows, monkeypatch):
+    """较小的 ID 晚于较大的 ID 提交时仍会加入索引；超过等待时间的空缺不再查询"""
+    monkeypatch.setattr(CONFIG, "QUIZ_COMPACT_STORAGE", False)
+    monkeypatch.setattr(CONFIG, "QUIZ_LAZY_SCORING", False)
+    bank = quiz.question_banks.current
+    first, late, early = (
+        make_rows(random_answers(random.Random(31), 3), name_prefix=prefix)
+        for prefix in ("first", "late", "early")
+    )
+
+    async def insert_with_ids(rows, start_id):
+        codes = await quiz.code_allocator.allocate(len(rows))
+        values = []
+        for offset, (row, code) in enumerate(zip(rows, codes)):
+            row["code"] = code
+            values.append({**encode_quiz_row(row, bank), "id": start_id + offset})
+        async with async_session() as db:
+            await db.execute(insert(QuizResult), values)
+            await db.commit()
+        return codes
+
+    async def refresh():
+        async with async_session() as db:
+            await quiz.refresh_match_index(db)
+
+    async def scenario():
+        await insert_with_ids(first, 1)
+        await refresh()
+        # ID 10..12 先提交，分配到 ID 4..9 的事务尚未提交
+        await insert_with_ids(early, 10)
+        await refresh()
+        pending = match_index.pending_ids(CONFIG.QUIZ_MATCH_INDEX_GAP_TIMEOUT)
+        late_codes = await insert_with_ids(late, 4)
+        await refresh()
+        indexed = all(code in match_index for code in late_codes)
+        remaining = match_index.pending_ids(CONFIG.QUIZ_MATCH_INDEX_GAP_TIMEOUT)
+        return pending, indexed, remaining
+
+    pending, indexed, remaining = run(scenario())
+    assert pending == list(range(4, 10))
+    assert indexed
+    assert remaining == [7, 8, 9]
+    assert match_index.last_id == 12
+    assert len(match_index) == 9
+
+    # 超过等待时间的空缺视为已回滚
+    assert match_index.pending_ids(0) == []
@@ -0,0 +1,59 @@
+import gzip
+
+from backend.prerender import PrerenderedJSON
+from backend.router import quiz
+
+from .conftest import api_client
+
+QUESTIONS_URL = "/api/quiz/questions"
+
+
+def get_questions(run, **headers):
+    async def request():
+        async with api_client() as client:
+            return await client.get(QUESTIONS_URL, headers=headers)
+
+    return run(request())
+
+
+def test_questions_payload_hides_option_scores(run):
+    response = get_questions(run, **{"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    questions = response.json()
+    assert len(questions) == len(quiz.question_banks.current.questions)
+    assert all("option_scores" not in question for question in questions)
+
+
+def test_questions_gzip_variant(run):
+    plain = get_questions(run, **{"Accept-Encoding": "identity"})
+    compressed = get_questions(run, **{"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["vary"]
+    assert compressed.json() == plain.json()
+    assert compressed.headers["etag"] != plain.headers["etag"]
+
+
+def test_questions_if_none_match(run):
+    etag = get_questions(run, **{"Accept-Encoding": "identity"}).headers["etag"]
+
+    # 任一编码版本的 ETag（包括弱比较形式）都视为内容未变化
+    cached = get_questions(run, **{"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] != etag
+    weak = get_questions(run, **{"If-None-Match": f'"other", W/{etag}'})
+    assert weak.status_code == 304
+
+    stale = get_questions(run, **{"If-None-Match": '"stale"'})
+    assert stale.status_code == 200
+
+
+def test_choose_encoding():
+    payload = PrerenderedJSON({"a": 1})
+    assert payload._choose_encoding("") == "identity"
+    assert payload._choose_encoding("gzip;q=0, deflate") == "identity"
+    assert payload._choose_encoding("deflate, gzip;q=0.5") == "gzip"
+    assert payload._choose_encoding("*") in payload.variants
+    body, _ = payload.variants["gzip"]
+    assert gzip.decompress(body) == payload.variants["identity"][0]
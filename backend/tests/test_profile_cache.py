@@ -0,0 +1,112 @@
+import random
+from types import SimpleNamespace
+
+from sqlalchemy import event
+
+from backend.database import engine
+from backend.model import quiz as quiz_model
+from backend.model.quiz import QuizProfile, QuizProfileCache, profile_cache
+
+from .conftest import api_client, random_answers
+
+
+def profile(code):
+    return QuizProfile(code, None, {}, {}, {})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_lru_eviction_order():
+    cache = QuizProfileCache(2, ttl=60)
+    cache.put(profile("A"))
+    cache.put(profile("B"))
+    # 读取 A 之后 B 成为最久未使用的条目
+    assert set(cache.get_many(["A"])) == {"A"}
+    cache.put(profile("C"))
+    assert set(cache.get_many(["A", "B", "C"])) == {"A", "C"}
+    assert cache.stats() == {
+        "size": 2,
+        "max_size": 2,
+        "ttl": 60,
+        "hits": 3,
+        "misses": 1,
+        "hit_rate": 0.75,
+    }
+
+
+def test_ttl_expiry(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(quiz_model, "time", SimpleNamespace(monotonic=clock.monotonic))
+    cache = QuizProfileCache(10, ttl=5)
+    cache.put(profile("A"))
+    clock.now += 4
+    cache.put(profile("B"))
+    assert set(cache.get_many(["A", "B"])) == {"A", "B"}
+    clock.now += 2
+    # 读取不续期：A 已过期并被删除，B 仍有效
+    assert set(cache.get_many(["A", "B"])) == {"B"}
+    assert cache.stats()["size"] == 1
+    clock.now += 10
+    assert cache.get_many(["B"]) == {}
+    assert cache.stats()["misses"] == 2
+
+
+def test_disabled_cache():
+    cache = QuizProfileCache(0, ttl=60)
+    cache.put(profile("A"))
+    assert cache.get_many(["A"]) == {}
+    assert cache.stats()["size"] == 0
+
+
+def count_queries(statements):
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    return listener
+
+
+def test_warm_cache_match_skips_database(database, run):
+    """答题结果缓存命中时 /match 不查询数据库"""
+    answers_list = random_answers(random.Random(61), 2)
+    statements = []
+    listener = count_queries(statements)
+
+    async def scenario():
+        async with api_client() as client:
+            codes = []
+            for answers in answers_list:
+                response = await client.post(
+                    "/api/quiz/submit", json={"answers": answers}
+                )
+                codes.append(response.json()["unique_code"])
+            payload = {"code1": codes[0], "code2": codes[1]}
+
+            event.listen(engine.sync_engine, "before_cursor_execute", listener)
+            try:
+                warm = [
+                    await client.post("/api/quiz/match", json=payload) for _ in range(3)
+                ]
+                warm_queries = len(statements)
+                profile_cache.invalidate()
+                cold = await client.post("/api/quiz/match", json=payload)
+                cold_queries = len(statements) - warm_queries
+                again = await client.post("/api/quiz/match", json=payload)
+                again_queries = len(statements) - warm_queries - cold_queries
+            finally:
+                event.remove(engine.sync_engine, "before_cursor_execute", listener)
+            stats = (await client.get("/api/quiz/cache-stats")).json()
+        return warm, cold, again, (warm_queries, cold_queries, again_queries), stats
+
+    warm, cold, again, queries, stats = run(scenario())
+    assert all(response.status_code == 200 for response in warm + [cold, again])
+    assert cold.json() == warm[0].json() == again.json()
+    # 冷缓存时一次 IN 查询取回两个代码
+    assert queries == (0, 1, 0)
+    assert stats == profile_cache.stats()
+    assert stats["size"] == 2
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+import random
+from argparse import Namespace
+
+import pytest
+from sqlalchemy import func, select
+
+from backend import cli
+from backend.config import CONFIG
+from backend.database import async_session
+from backend.model.quiz import QuizProfile, QuizResult, profile_cache
+from backend.model.quiz_index import match_index
+from backend.question_bank import MAX_VERSION_LENGTH, QuestionBank, QuestionBankRegistry
+from backend.router import quiz
+
+from .conftest import api_client, random_answers
+
+
+def write_bank(path, version, bump=0):
+    """写入默认题库的副本，bump 改变第一题第一个选项的加分（即计分版本）"""
+    data = json.loads(CONFIG.QUIZ_BANK_PATH.read_text(encoding="utf-8"))
+    data["version"] = version
+    scores = data["questions"][0]["option_scores"][0]
+    dimension = next(iter(scores))
+    trait = next(iter(scores[dimension]))
+    scores[dimension][trait] += bump
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    # 保证修改时间变化，不受文件系统时间精度影响
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10 * (bump + 1)))
+
+
+def test_reload_swaps_version_and_notifies(tmp_path, run):
+    path = tmp_path / "bank.json"
+    write_bank(path, "v1")
+    registry = QuestionBankRegistry(path)
+    events = []
+    registry.add_listener(lambda old, new: events.append((old.version, new.version)))
+    first = registry.current
+
+    write_bank(path, "v2", bump=1)
+    previous, bank = run(registry.reload())
+    assert previous is first
+    assert registry.current is bank
+    assert bank.version == "v2"
+    assert bank.scoring.version != first.scoring.version
+    assert events == [("v1", "v2")]
+    assert registry.versions()["version"] == "v2"
+
+    # 格式错误的题库不替换当前题库，也不通知
+    path.write_text("{", encoding="utf-8")
+    with pytest.raises(ValueError):
+        run(registry.reload())
+    assert registry.current is bank
+    assert len(events) == 1
+
+
+def test_watch_reloads_changed_file(tmp_path, run):
+    path = tmp_path / "bank.json"
+    write_bank(path, "v1")
+    registry = QuestionBankRegistry(path)
+
+    async def scenario():
+        task = asyncio.create_task(registry.watch(0.01))
+        try:
+            write_bank(path, "v2", bump=1)
+            await asyncio.sleep(0.2)
+            swapped = registry.current.version
+            path.write_text("{", encoding="utf-8")
+            os.utime(path, (0, path.stat().st_mtime + 100))
+            await asyncio.sleep(0.2)
+            return swapped, registry.current.version
+        finally:
+            task.cancel()
+
+    assert run(scenario()) == ("v2", "v2")
+
+
+def test_scoring_change_invalidates_derived_caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(CONFIG, "QUIZ_COMPACT_STORAGE", False)
+    monkeypatch.setattr(CONFIG, "QUIZ_LAZY_SCORING", False)
+    path = tmp_path / "bank.json"
+    write_bank(path, "v1")
+    registry = QuestionBankRegistry(path)
+    old = registry.current
+    write_bank(path, "v2", bump=1)
+    new = asyncio.run(registry.reload())[1]
+
+    profile_cache.put(QuizProfile("ABCD", None, {}, {}, {}))
+    quiz.on_question_bank_reload(old, old)
+    assert profile_cache.get_many(["ABCD"])
+    quiz.on_question_bank_reload(old, new)
+    assert not profile_cache.get_many(["ABCD"])
+
+
+class ReloadMidStream:
+    """只交出第一行，然后在读取下一批之前（一次 await 中）执行 reload"""
+
+    def __init__(self, result, reload):
+        self._result = result
+        self._reload = reload
+
+    async def partitions(self):
+        rows = [row async for chunk in self._result.partitions() for row in chunk]
+        yield rows[:1]
+        self._reload()
+        yield rows[1:]
+
+    async def close(self):
+        await self._result.close()
+
+
+def test_reload_during_refresh_restarts_match_index(
+    database, run, make_rows, monkeypatch, tmp_path
+):
+    """刷新途中题库重载清空了索引时，刷新按新题库从头加载，不丢失答题者"""
+    monkeypatch.setattr(CONFIG, "QUIZ_COMPACT_STORAGE", True)
+    monkeypatch.setattr(CONFIG, "QUIZ_LAZY_SCORING", False)
+    old = quiz.question_banks.current
+    answers_list = random_answers(random.Random(23), 6)
+    rows = make_rows(answers_list)
+    path = tmp_path / "bank.json"
+    write_bank(path, "v2", bump=1)
+    new = QuestionBank.load(path)
+
+    def reload():
+        monkeypatch.setattr(quiz.question_banks, "current", new)
+        quiz.on_question_bank_reload(old, new)
+
+    async def scenario():
+        async with async_session() as db:
+            codes = await quiz.insert_quiz_results(db, rows, old)
+        async with async_session() as db:
+            stream = db.stream
+
+            async def stream_once(statement):
+                db.stream = stream
+                return ReloadMidStream(await stream(statement), reload)
+
+            db.stream = stream_once
+            await quiz.refresh_match_index(db)
+            max_id = (await db.execute(select(func.max(QuizResult.id)))).scalar_one()
+        return codes, max_id
+
+    codes, max_id = run(scenario())
+    assert len(match_index) == len(rows)
+    assert match_index.last_id == max_id
+    for code, answers in zip(codes, answers_list):
+        assert match_index.participant(code)[1] == new.scoring.analyze(answers)[1]
+
+
+@pytest.mark.parametrize("version", ["", "v" * (MAX_VERSION_LENGTH + 1)])
+def test_invalid_version_is_rejected(tmp_path, version):
+    """题库版本要写入 bank_version 列，空版本或超出列长度的版本加载失败"""
+    path = tmp_path / "bank.json"
+    write_bank(path, version)
+    with pytest.raises(ValueError):
+        QuestionBank.load(path)
+    write_bank(path, "v" * MAX_VERSION_LENGTH)
+    assert QuestionBank.load(path).version == "v" * MAX_VERSION_LENGTH
+
+
+def test_reload_is_not_exposed_over_http(run):
+    async def request():
+        async with api_client() as client:
+            return await client.post("/api/quiz/bank/reload")
+
+    assert run(request()).status_code in (404, 405)
+
+
+def test_check_bank_cli(tmp_path, run):
+    path = tmp_path / "bank.json"
+    write_bank(path, "v9")
+    result = run(cli.check_bank(Namespace(path=path)))
+    assert result["version"] == "v9"
+
+    path.write_text("{", encoding="utf-8")
+    with pytest.raises(SystemExit):
+        run(cli.check_bank(Namespace(path=path)))
@@ -0,0 +1,137 @@
+import random
+
+from sqlalchemy import insert, select
+
+from backend.database import async_session
+from backend.model.quiz import (
+    CODE_LENGTH,
+    CODE_SPACE,
+    QuizCodeAllocator,
+    QuizCodeSequence,
+    QuizResult,
+)
+from backend.model.quiz_stats import quiz_stats
+from backend.router import quiz
+
+from .conftest import random_answers
+
+
+def test_allocator_codes_are_unique(database, run):
+    allocator = QuizCodeAllocator(3)
+
+    async def allocate():
+        codes = []
+        for count in (1, 2, 5, 1, 7):
+            codes += await allocator.allocate(count)
+        return codes
+
+    codes = run(allocate())
+    assert len(codes) == 16
+    assert len(set(codes)) == len(codes)
+    assert all(len(code) == CODE_LENGTH for code in codes)
+
+
+def test_allocator_skips_existing_codes(database, run):
+    """预留的代码段中已被旧版本随机代码占用的代码不会再发出"""
+    probe = QuizCodeAllocator(8)
+    run(probe.allocate(8))
+    next_block = [probe._encode(index) for index in range(8, 16)]
+    taken = set(next_block[::2])
+
+    async def allocate():
+        async with async_session() as db:
+            await db.execute(
+                insert(QuizResult), [{"code": code, "answers": {}} for code in taken]
+            )
+            await db.commit()
+        return await QuizCodeAllocator(8).allocate(4)
+
+    codes = run(allocate())
+    assert codes == next_block[1::2]
+
+
+class CollidingAllocator(QuizCodeAllocator):
+    """第一次分配返回已被占用的代码，之后按正常逻辑（每次补充一个代码）"""
+
+    def __init__(self, taken):
+        super().__init__(1)
+        self.taken = taken
+
+    async def allocate(self, count=1):
+        if self.taken:
+            codes, self.taken = self.taken, None
+            return codes
+        return await super().allocate(count)
+
+
+def test_insert_retries_after_collision_and_refill(
+    database, run, make_rows, monkeypatch
+):
+    """代码冲突后重试时分配器需要补充代码段，不能与请求会话的写锁互相等待"""
+    bank = quiz.question_banks.current
+    rows = make_rows(random_answers(random.Random(1), 2))
+
+    async def scenario():
+        async with async_session() as db:
+            (first,) = await quiz.insert_quiz_results(db, rows[:1], bank)
+            await db.commit()
+
+        monkeypatch.setattr(quiz, "code_allocator", CollidingAllocator([first]))
+        async with async_session() as db:
+            (second,) = await quiz.insert_quiz_results(db, rows[1:], bank)
+            await db.commit()
+
+        async with async_session() as db:
+            codes = (await db.execute(select(QuizResult.code))).scalars().all()
+            stats = await quiz_stats.snapshot(db)
+        return first, second, codes, stats
+
+    first, second, codes, stats = run(scenario())
+    assert second != first
+    assert sorted(codes) == sorted([first, second])
+    assert stats["total_submissions"] == 2
+
+
+def test_code_permutation_is_keyed():
+    """代码由密钥决定，相邻序号的代码之间没有固定差值"""
+    first, second = QuizCodeAllocator(1), QuizCodeAllocator(1)
+    first._key, second._key = bytes(32), bytes(range(32))
+    indexes = range(5000)
+    codes = [first._permute(index) for index in indexes]
+    assert len(set(codes)) == len(codes)
+    assert all(0 <= code < CODE_SPACE for code in codes)
+    assert codes != [second._permute(index) for index in indexes]
+    differences = {(b - a) % CODE_SPACE for a, b in zip(codes, codes[1:])}
+    assert len(differences) > 4900
+
+
+def test_legacy_sequence_gets_a_key(database, run):
+    """旧版本（没有密钥）的序列升级后继续发放，不与已有代码重复"""
+
+    async def scenario():
+        async with async_session() as db:
+            await db.execute(
+                insert(QuizCodeSequence).values(
+                    id=QuizCodeAllocator.SEQUENCE_ID, next_index=3
+                )
+            )
+            await db.commit()
+        probe = QuizCodeAllocator(1)
+        await probe._load_sequence()
+        taken = [probe._encode(index) for index in range(3, 13)]
+        async with async_session() as db:
+            await db.execute(
+                insert(QuizResult), [{"code": code, "answers": {}} for code in taken]
+            )
+            await db.commit()
+        codes = await QuizCodeAllocator(4).allocate(10)
+        async with async_session() as db:
+            key = (
+                await db.execute(select(QuizCodeSequence.permutation_key))
+            ).scalar_one()
+        return probe._key, key, taken, codes
+
+    probe_key, key, taken, codes = run(scenario())
+    assert key is not None and bytes.fromhex(key) == probe_key
+    assert len(set(codes)) == 10
+    assert not set(codes) & set(taken)
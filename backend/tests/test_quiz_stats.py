@@ -0,0 +1,94 @@
+import random
+
+import pytest
+from sqlalchemy import func, select, update
+
+from backend import cli
+from backend.database import async_session
+from backend.model.quiz import QuizResult
+from backend.model.quiz_stats import QuizStats, quiz_stats
+from backend.router import quiz
+
+from .conftest import api_client, random_answers
+
+
+async def count_results(db):
+    return (await db.execute(select(func.count()).select_from(QuizResult))).scalar_one()
+
+
+def test_incremental_stats_match_rebuild(database, run, make_rows):
+    """逐次提交累计的统计与从答题记录完整重建的结果一致"""
+    rng = random.Random(7)
+    bank = quiz.question_banks.current
+    batches = [
+        make_rows(random_answers(rng, 5), name_prefix="a"),
+        # 重名的参与者只计一次
+        make_rows(random_answers(rng, 3), name_prefix="a"),
+        make_rows([{}], name_prefix="empty"),
+        make_rows(random_answers(rng, 4), name_prefix="b"),
+    ]
+    batches[2][0]["participant_name"] = ""
+
+    async def scenario():
+        for rows in batches:
+            async with async_session() as db:
+                await quiz.insert_quiz_results(db, rows, bank)
+        async with async_session() as db:
+            incremental = await quiz_stats.snapshot(db)
+            await quiz_stats.rebuild(db)
+            await db.commit()
+            rebuilt = await quiz_stats.snapshot(db)
+        return incremental, rebuilt
+
+    incremental, rebuilt = run(scenario())
+    assert incremental == rebuilt
+    assert incremental["total_submissions"] == 13
+    assert incremental["total_participants"] == 9
+
+
+def test_failed_stats_update_rolls_back_insert(database, run, make_rows, monkeypatch):
+    """统计更新失败时答题记录与统计都不变"""
+    bank = quiz.question_banks.current
+    rows = make_rows(random_answers(random.Random(3), 2))
+
+    async def fail(db, rows):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        async with async_session() as db:
+            await quiz.insert_quiz_results(db, rows[:1], bank)
+            before = await quiz_stats.snapshot(db)
+
+        monkeypatch.setattr(quiz.quiz_stats, "record", fail)
+        async with async_session() as db:
+            with pytest.raises(RuntimeError):
+                await quiz.insert_quiz_results(db, rows[1:], bank)
+
+        async with async_session() as db:
+            return before, await quiz_stats.snapshot(db), await count_results(db)
+
+    before, after, count = run(scenario())
+    assert count == 1
+    assert after == before
+
+
+def test_stats_endpoint_is_read_only(database, run, make_rows):
+    """GET /stats 只读取累计值，重新统计只能通过命令行执行"""
+    bank = quiz.question_banks.current
+    rows = make_rows(random_answers(random.Random(5), 3))
+
+    async def scenario():
+        async with async_session() as db:
+            await quiz.insert_quiz_results(db, rows, bank)
+            await db.execute(update(QuizStats).values(total_submissions=1))
+            await db.commit()
+
+        async with api_client() as client:
+            response = await client.get("/api/quiz/stats", params={"recompute": "true"})
+        rebuilt = await cli.rebuild_stats(None)
+        return response, rebuilt
+
+    response, rebuilt = run(scenario())
+    assert response.status_code == 200
+    assert response.json()["total_submissions"] == 1
+    assert rebuilt["total_submissions"] == 3
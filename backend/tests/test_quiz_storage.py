@@ -0,0 +1,94 @@
+import random
+
+import pytest
+from sqlalchemy import select, update
+
+from backend.config import CONFIG
+from backend.database import async_session
+from backend.model.quiz import QuizResult, pack_answers, profile_cache, unpack_answers
+from backend.model.quiz_index import match_index
+from backend.router import quiz
+
+from .conftest import random_answers
+
+
+def test_packed_answers_round_trip():
+    answers = random_answers(random.Random(11))[0]
+    assert unpack_answers(pack_answers(answers)) == answers
+    # 无法无损打包的答案退回 JSON 存储
+    assert pack_answers({"1": "01"}) is None
+    assert pack_answers({"300": "1"}) is None
+
+
+def test_packed_trait_scores_round_trip():
+    scoring = quiz.question_banks.current.scoring
+    for answers in random_answers(random.Random(12), 20):
+        trait_scores, primary_traits, radar_data = scoring.analyze(answers)
+        packed = scoring.pack_trait_scores(trait_scores)
+        assert scoring.analyze_totals(scoring.unpack_totals(packed)) == (
+            trait_scores,
+            primary_traits,
+            radar_data,
+        )
+
+
+async def store_and_fetch(rows):
+    """写入后清空缓存，再从数据库还原"""
+    bank = quiz.question_banks.current
+    async with async_session() as db:
+        codes = await quiz.insert_quiz_results(db, rows, bank)
+    profile_cache.invalidate()
+    async with async_session() as db:
+        return await quiz.fetch_quiz_results(db, codes)
+
+
+@pytest.mark.parametrize("compact, lazy", [(True, False), (False, True)])
+def test_storage_modes_round_trip(database, run, make_rows, monkeypatch, compact, lazy):
+    """紧凑存储与延迟计分还原出的结果与 JSON 存储相同"""
+    monkeypatch.setattr(CONFIG, "QUIZ_COMPACT_STORAGE", compact)
+    monkeypatch.setattr(CONFIG, "QUIZ_LAZY_SCORING", lazy)
+    rows = make_rows(random_answers(random.Random(13), 10))
+    profiles = run(store_and_fetch(rows))
+    for row, profile in zip(rows, profiles):
+        assert profile.trait_scores == row["trait_scores"]
+        assert profile.primary_traits == row["primary_traits"]
+        assert profile.radar_data == row["radar_data"]
+
+
+def stale_primary_traits(primary_traits):
+    """每个维度换成另一个特质，模拟旧计分版本算出的主要特质"""
+    scoring = quiz.question_banks.current.scoring
+    return {
+        dimension: next(t for t in scoring.dimension_traits[dimension] if t != trait)
+        for dimension, trait in primary_traits.items()
+    }
+
+
+def test_stale_packed_rows_are_rescored_together(database, run, make_rows, monkeypatch):
+    """旧计分版本的紧凑行按当前题库重新计算全部派生字段，不混用存储的主要特质"""
+    monkeypatch.setattr(CONFIG, "QUIZ_COMPACT_STORAGE", True)
+    monkeypatch.setattr(CONFIG, "QUIZ_LAZY_SCORING", False)
+    (row,) = make_rows(random_answers(random.Random(14)))
+
+    async def scenario():
+        (profile,) = await store_and_fetch([row])
+        async with async_session() as db:
+            await db.execute(
+                update(QuizResult).values(
+                    scoring_version="stale",
+                    primary_traits=stale_primary_traits(row["primary_traits"]),
+                )
+            )
+            await db.commit()
+        profile_cache.invalidate()
+        async with async_session() as db:
+            (rescored,) = await quiz.fetch_quiz_results(db, [profile.code])
+            await quiz.refresh_match_index(db)
+            stored = (await db.execute(select(QuizResult.primary_traits))).scalar_one()
+        return rescored, stored
+
+    rescored, stored = run(scenario())
+    assert stored != row["primary_traits"]
+    assert rescored.primary_traits == row["primary_traits"]
+    assert rescored.trait_scores == row["trait_scores"]
+    assert match_index.participant(rescored.code)[1] == row["primary_traits"]
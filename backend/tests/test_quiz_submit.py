@@ -0,0 +1,114 @@
+import random
+
+import pytest
+from sqlalchemy import func, select
+
+from backend.database import async_session
+from backend.model.quiz import QuizResult
+from backend.model.quiz_index import match_index
+from backend.model.quiz_stats import quiz_stats
+from backend.router import quiz
+
+from .conftest import api_client, random_answers
+
+
+def sample_answers(seed, count):
+    """随机答案，混入重复、部分作答和空答案"""
+    rng = random.Random(seed)
+    answers_list = random_answers(rng, count)
+    answers_list[1] = dict(answers_list[0])
+    answers_list[2] = dict(list(answers_list[2].items())[:3])
+    answers_list[3] = {}
+    return answers_list
+
+
+async def post(url, payload):
+    async with api_client() as client:
+        return await client.post(url, json=payload)
+
+
+async def stored_rows():
+    async with async_session() as db:
+        count = (
+            await db.execute(select(func.count()).select_from(QuizResult))
+        ).scalar_one()
+        return count, await quiz_stats.snapshot(db)
+
+
+def test_analyze_many_matches_analyze():
+    scoring = quiz.question_banks.current.scoring
+    answers_list = sample_answers(51, 40)
+    assert scoring.analyze_many(answers_list) == [
+        scoring.analyze(answers) for answers in answers_list
+    ]
+
+
+def test_submit_over_http(database, run):
+    (answers,) = random_answers(random.Random(52))
+    scoring = quiz.question_banks.current.scoring
+
+    async def scenario():
+        response = await post(
+            "/api/quiz/submit", {"participant_name": "张三", "answers": answers}
+        )
+        return response, await stored_rows()
+
+    response, (count, stats) = run(scenario())
+    assert response.status_code == 200
+    payload = response.json()
+    trait_scores, primary_traits, radar_data = scoring.analyze(answers)
+    assert payload["trait_scores"] == trait_scores
+    assert payload["primary_traits"] == primary_traits
+    assert payload["radar_data"] == radar_data
+    assert payload["unique_code"] in match_index
+    assert count == 1
+    assert stats["total_submissions"] == 1
+
+
+def test_submit_batch_matches_single_scoring(database, run):
+    answers_list = sample_answers(53, 30)
+    scoring = quiz.question_banks.current.scoring
+    submissions = [
+        {"participant_name": f"p{i % 20}", "answers": answers}
+        for i, answers in enumerate(answers_list)
+    ]
+
+    async def scenario():
+        response = await post("/api/quiz/submit-batch", {"submissions": submissions})
+        codes = [item["unique_code"] for item in response.json()["results"]]
+        async with async_session() as db:
+            profiles = await quiz.fetch_quiz_results(db, codes)
+        return response, profiles, await stored_rows()
+
+    response, profiles, (count, stats) = run(scenario())
+    assert response.status_code == 200
+    results = response.json()["results"]
+    codes = [item["unique_code"] for item in results]
+    assert len(set(codes)) == len(answers_list)
+    assert all(code in match_index for code in codes)
+    for answers, item, profile in zip(answers_list, results, profiles):
+        expected = scoring.analyze(answers)
+        assert item["primary_traits"] == expected[1]
+        assert (
+            profile.trait_scores,
+            profile.primary_traits,
+            profile.radar_data,
+        ) == expected
+
+    assert count == len(answers_list)
+    assert stats["total_submissions"] == len(answers_list)
+    assert stats["total_participants"] == 20
+
+
+def test_submit_batch_is_atomic_with_stats(database, run, monkeypatch):
+    """统计更新失败时整批答题记录都不写入"""
+    submissions = [{"answers": answers} for answers in sample_answers(54, 5)]
+
+    async def fail(db, rows):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(quiz.quiz_stats, "record", fail)
+    with pytest.raises(RuntimeError):
+        run(post("/api/quiz/submit-batch", {"submissions": submissions}))
+    assert run(stored_rows()) == (0, None)
+    assert len(match_index) == 0
@@ -0,0 +1,148 @@
+import json
+import random
+
+import pytest
+from sqlalchemy import MetaData, select
+from sqlalchemy.dialects import postgresql
+
+from backend.config import CONFIG
+from backend.database import async_session, engine
+from backend.model.quiz import QuizResult, decode_quiz_profile, profile_cache
+from backend.question_bank import QuestionBank
+from backend.rescoring import JSON_COLUMNS, _update_statement, rescore_quiz_results
+from backend.router import quiz
+
+from .conftest import random_answers
+
+
+def write_bank(path, version):
+    """默认题库的副本，改变第一题各选项的加分（计分版本随之变化）"""
+    data = json.loads(CONFIG.QUIZ_BANK_PATH.read_text(encoding="utf-8"))
+    data["version"] = version
+    for option in data["questions"][0]["option_scores"]:
+        for traits in option.values():
+            for trait in traits:
+                traits[trait] += 3
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+async def stored_profiles(scoring):
+    profile_cache.invalidate()
+    async with async_session() as db:
+        result = await db.execute(
+            select(
+                QuizResult.code,
+                QuizResult.participant_name,
+                QuizResult.primary_traits,
+                QuizResult.trait_scores,
+                QuizResult.radar_data,
+                QuizResult.trait_scores_packed,
+                QuizResult.answers,
+                QuizResult.answers_packed,
+                QuizResult.scoring_version,
+            ).order_by(QuizResult.id)
+        )
+        return [decode_quiz_profile(scoring, *row) for row in result.all()]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_rescore_is_idempotent(
+    database, run, make_rows, monkeypatch, tmp_path, compact
+):
+    """重新计分后结果与新题库直接计分一致，再次运行不再修改任何行"""
+    monkeypatch.setattr(CONFIG, "QUIZ_COMPACT_STORAGE", compact)
+    monkeypatch.setattr(CONFIG, "QUIZ_LAZY_SCORING", False)
+    answers_list = random_answers(random.Random(41), 25)
+    rows = make_rows(answers_list)
+    path = tmp_path / "bank.json"
+    write_bank(path, "rescore-test")
+    bank = QuestionBank.load(path)
+    assert bank.scoring.version != quiz.question_banks.current.scoring.version
+
+    async def scenario():
+        async with async_session() as db:
+            await quiz.insert_quiz_results(db, rows, quiz.question_banks.current)
+        first = await rescore_quiz_results(path, chunk_size=7)
+        second = await rescore_quiz_results(path, chunk_size=7)
+        profiles = await stored_profiles(bank.scoring)
+        async with async_session() as db:
+            versions = (
+                await db.execute(
+                    select(QuizResult.bank_version, QuizResult.scoring_version)
+                )
+            ).all()
+        return first, second, profiles, versions
+
+    first, second, profiles, versions = run(scenario())
+    assert first.rows == len(rows)
+    assert second.rows == 0
+    assert set(versions) == {(bank.version, bank.scoring.version)}
+    for answers, profile in zip(answers_list, profiles):
+        assert (
+            profile.trait_scores,
+            profile.primary_traits,
+            profile.radar_data,
+        ) == bank.scoring.analyze(answers)
+
+
+def test_rescore_all_rewrites_every_row(database, run, make_rows, monkeypatch):
+    """rescore_all 处理全部行（在进程池中计分）"""
+    monkeypatch.setattr(CONFIG, "QUIZ_COMPACT_STORAGE", False)
+    monkeypatch.setattr(CONFIG, "QUIZ_LAZY_SCORING", False)
+    rows = make_rows(random_answers(random.Random(42), 5))
+
+    async def scenario():
+        async with async_session() as db:
+            await quiz.insert_quiz_results(db, rows, quiz.question_banks.current)
+        return await rescore_quiz_results(
+            CONFIG.QUIZ_BANK_PATH, chunk_size=2, workers=2, rescore_all=True
+        )
+
+    assert run(scenario()).rows == len(rows)
+
+
+async def recreate_with_not_null_json_columns():
+    """按最初的表结构重建 quiz_results：JSON 列都是 NOT NULL（已有数据库仍是如此）"""
+    table = QuizResult.__table__.to_metadata(MetaData())
+    for column in JSON_COLUMNS:
+        table.c[column].nullable = False
+    async with engine.begin() as conn:
+        await conn.run_sync(QuizResult.__table__.drop)
+        await conn.run_sync(table.create)
+
+
+@pytest.mark.parametrize("compact, lazy", [(True, False), (False, True)])
+def test_rescore_into_not_null_json_columns(
+    database, run, make_rows, monkeypatch, tmp_path, compact, lazy
+):
+    """紧凑存储与延迟计分写回的空 JSON 字段存 'null'，不违反 NOT NULL 约束"""
+    answers_list = random_answers(random.Random(43), 6)
+    rows = make_rows(answers_list)
+    path = tmp_path / "bank.json"
+    write_bank(path, "not-null-test")
+    bank = QuestionBank.load(path)
+
+    async def scenario():
+        await recreate_with_not_null_json_columns()
+        async with async_session() as db:
+            await quiz.insert_quiz_results(db, rows, quiz.question_banks.current)
+        monkeypatch.setattr(CONFIG, "QUIZ_COMPACT_STORAGE", compact)
+        monkeypatch.setattr(CONFIG, "QUIZ_LAZY_SCORING", lazy)
+        report = await rescore_quiz_results(path, chunk_size=4)
+        return report, await stored_profiles(bank.scoring)
+
+    report, profiles = run(scenario())
+    assert report.rows == len(rows)
+    for answers, profile in zip(answers_list, profiles):
+        assert (
+            profile.trait_scores,
+            profile.primary_traits,
+            profile.radar_data,
+        ) == bank.scoring.analyze(answers)
+
+
+def test_postgresql_update_casts_json_text():
+    """PostgreSQL 不会把 VARCHAR 参数隐式转换为 json，JSON 列需显式 CAST"""
+    sql = str(_update_statement("postgresql").compile(dialect=postgresql.dialect()))
+    for column in JSON_COLUMNS:
+        assert f"{column}=CAST(%(new_{column})s AS JSON)" in sql
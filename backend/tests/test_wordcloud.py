@@ -0,0 +1,171 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from backend.database import async_session
+from backend.logger import logger
+from backend.model.wordcloud import (
+    PRESET_WORDS,
+    WordCloudBroadcaster,
+    WordCloudStorage,
+    WordTrendBucket,
+)
+from backend.schema.wordcloud import WordCloudEntry
+
+from .conftest import api_client
+
+
+def test_trend_buckets_use_server_time(database, run):
+    """客户端上报的 created_at 不影响趋势分桶"""
+    storage = WordCloudStorage()
+    entry = WordCloudEntry(
+        words=PRESET_WORDS[:2], created_at=datetime.now() - timedelta(days=3)
+    )
+
+    async def scenario():
+        async with async_session() as db:
+            started = datetime.now().replace(second=0, microsecond=0)
+            await storage.add_entry(db, entry)
+            buckets = (await db.execute(select(WordTrendBucket.bucket))).scalars().all()
+            body, _ = await storage.get_trending_payload(db, window=5)
+        return started, buckets, json.loads(body)
+
+    started, buckets, trending = run(scenario())
+    assert all(bucket >= started.replace(minute=0) for bucket in buckets)
+    assert {item["text"] for item in trending} == set(PRESET_WORDS[:2])
+
+
+def test_dedup_records_pairs_only_after_commit(database, run, monkeypatch):
+    """写入失败的选择不计入去重过滤器，重试时仍然计数"""
+    storage = WordCloudStorage(dedup_enabled=True)
+    entry = WordCloudEntry(words=PRESET_WORDS[:2], session_id="s1")
+    record_trend = storage._record_trend
+
+    async def fail(db, increments):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        async with async_session() as db:
+            monkeypatch.setattr(storage, "_record_trend", fail)
+            with pytest.raises(RuntimeError):
+                await storage.add_entry(db, entry)
+            await db.rollback()
+
+            monkeypatch.setattr(storage, "_record_trend", record_trend)
+            counted = [await storage.add_entry(db, entry) for _ in range(2)]
+            frequencies = await storage.get_word_frequencies(db)
+        return counted, frequencies
+
+    counted, frequencies = run(scenario())
+    assert counted == [2, 0]
+    assert frequencies == dict.fromkeys(PRESET_WORDS[:2], 1)
+    assert storage.dedup_filter.rejected == 2
+
+
+def test_validate_words_normalizes_and_rejects_unknown(database, run):
+    storage = WordCloudStorage(free_words_enabled=False)
+
+    async def scenario():
+        async with async_session() as db:
+            normalized = await storage.validate_words(db, [" ＤＤＬ警长 "])
+            with pytest.raises(ValueError):
+                await storage.validate_words(db, ["不存在的词"])
+        return normalized
+
+    assert run(scenario()) == ["DDL警长"]
+
+
+def test_global_wordcloud_etag(database, run):
+    """内容未变化时按 If-None-Match 返回 304，词频变化后 ETag 随之改变"""
+    entry = WordCloudEntry(words=PRESET_WORDS[:3])
+
+    async def scenario():
+        async with api_client() as client:
+            first = await client.get("/api/wordcloud/global")
+            etag = first.headers["etag"]
+            cached = await client.get(
+                "/api/wordcloud/global", headers={"If-None-Match": f"W/{etag}"}
+            )
+            await client.post("/api/wordcloud/save", json=entry.model_dump(mode="json"))
+            changed = await client.get(
+                "/api/wordcloud/global", headers={"If-None-Match": etag}
+            )
+        return first, cached, changed
+
+    first, cached, changed = run(scenario())
+    assert first.status_code == 200
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != first.headers["etag"]
+    assert {item["text"] for item in changed.json()} == set(PRESET_WORDS[:3])
+
+
+def test_stream_publishes_deltas(database, run):
+    """订阅者收到按 tick 合并后的词频增量"""
+    storage = WordCloudStorage()
+    broadcaster = WordCloudBroadcaster(storage, tick_interval=0.01)
+    words = PRESET_WORDS[:2]
+
+    async def scenario():
+        stream = broadcaster.subscribe()
+        task = asyncio.create_task(broadcaster.run())
+        try:
+            assert (await anext(stream)).startswith(b"retry:")
+            # 等待广播器建立基线
+            await asyncio.sleep(0.05)
+            async with async_session() as db:
+                await storage.add_entry(db, WordCloudEntry(words=words + words[:1]))
+            return await asyncio.wait_for(anext(stream), timeout=2)
+        finally:
+            task.cancel()
+            await stream.aclose()
+
+    frame = run(scenario()).decode("utf-8")
+    assert "event: delta" in frame
+    data = json.loads(frame.split("data: ", 1)[1])
+    assert {item["text"]: item["delta"] for item in data} == {words[0]: 2, words[1]: 1}
+
+
+def test_stream_logs_and_survives_tick_errors(database, run, monkeypatch):
+    """单次 tick 失败时记录异常日志，广播循环继续运行"""
+    storage = WordCloudStorage()
+    broadcaster = WordCloudBroadcaster(storage, tick_interval=0.01)
+    broadcaster.subscribers = 1
+    failures = []
+    messages = []
+    get_word_frequencies = storage.get_word_frequencies
+
+    async def flaky(db):
+        if not failures:
+            failures.append(True)
+            raise RuntimeError("boom")
+        return await get_word_frequencies(db)
+
+    monkeypatch.setattr(storage, "get_word_frequencies", flaky)
+    sink = logger.add(messages.append, level="ERROR")
+
+    async def scenario():
+        task = asyncio.create_task(broadcaster.run())
+        try:
+            await asyncio.sleep(0.05)
+            async with async_session() as db:
+                await storage.add_entry(db, WordCloudEntry(words=PRESET_WORDS[:1]))
+            for _ in range(100):
+                if broadcaster._sequence:
+                    break
+                await asyncio.sleep(0.01)
+            return task.done()
+        finally:
+            task.cancel()
+
+    try:
+        finished = run(scenario())
+    finally:
+        logger.remove(sink)
+    assert not finished
+    assert broadcaster._sequence == 1
+    assert any("词频广播失败" in message and "boom" in message for message in messages)